@@ -0,0 +1,114 @@
+"""個人ベースラインからの逸脱（z スコア）によるチームアラート
+
+選手ごとに最新の記録日の値を、その前 window_days 日間（当日は含まない）の
+本人の値と比べる。数値の指標はすべて、チーム全員分をまとめて計算する。
+  - method="mean"   ：z = (値 - 平均) / 標準偏差
+  - method="median" ：z = (値 - 中央値) / (1.4826 × MAD)（外れ値に強い）
+"""
+import numpy as np
+import pandas as pd
+
+from rollup import rollup_columns
+from schema import COLUMN_TYPES, metric_dict
+from selection import select_rows
+
+DEFAULT_WINDOW_DAYS = 28
+DEFAULT_MIN_COUNT = 7
+DEFAULT_THRESHOLD = 2.0
+METHODS = {"mean": "平均 ± 標準偏差", "median": "中央値 ± MAD"}
+
+# 正規分布のとき標準偏差と同じ尺度になる MAD の係数
+MAD_SCALE = 1.4826
+
+_METRIC_JA = {col: ja for ja, col in metric_dict.items()}
+
+# 対象の列（metric_dict の数値の指標）
+SOURCE_COLS = [col for col in metric_dict.values() if COLUMN_TYPES.get(col, "").startswith("float")]
+
+RESULT_COLS = ["name_norm", "measurement_date", "metric", "value", "center", "scale", "n", "z"]
+
+
+def latest_deviations(frame, method="mean", window_days=DEFAULT_WINDOW_DAYS, min_count=DEFAULT_MIN_COUNT):
+    """選手ごとに、最新の記録日の各指標の z スコアを縦持ちの表（列は RESULT_COLS）で返す
+
+    metric は列名、n はベースラインに使った記録数。
+    ベースラインの記録が min_count 未満、またはばらつきが 0 の指標は z が NaN。
+    """
+    cols = rollup_columns(frame)
+    if frame.empty or not cols:
+        return pd.DataFrame(columns=RESULT_COLS)
+
+    names = frame["name_norm"].astype(str)
+    days = frame["measurement_date"].dt.normalize()
+    latest = days.groupby(names).transform("max")
+    is_latest = days == latest
+    in_window = (days < latest) & (days >= latest - pd.Timedelta(days=window_days))
+
+    values = frame[cols].astype("float64").set_axis(names)
+    current = values[is_latest.to_numpy()].groupby(level=0).mean()
+    history = values[in_window.to_numpy()]
+    grouped = history.groupby(level=0)
+    if method == "median":
+        center = grouped.median()
+        scale = (history - center.reindex(history.index)).abs().groupby(level=0).median() * MAD_SCALE
+    else:
+        center = grouped.mean()
+        scale = grouped.std()
+    count = grouped.count()
+
+    wide = {
+        "value": current,
+        "center": center.reindex(current.index),
+        "scale": scale.reindex(current.index),
+        "n": count.reindex(current.index).fillna(0).astype("int64"),
+    }
+    z = (wide["value"] - wide["center"]) / wide["scale"].replace(0.0, np.nan)
+    wide["z"] = z.where(wide["n"] >= min_count)
+
+    result = pd.concat({k: v.stack() for k, v in wide.items()}, axis=1)
+    result = result[result["value"].notna()].rename_axis(["name_norm", "metric"]).reset_index()
+    result.insert(1, "measurement_date", result["name_norm"].map(latest.groupby(names).max()))
+    return result[RESULT_COLS]
+
+
+class BaselineAlerts:
+    """選手ごとの最新の記録日の z スコアの表
+
+    読み込み時に build() で作り、差分同期では update() で変更のあった選手だけ計算し直す。
+    どちらも新しいオブジェクトを返す。
+    """
+
+    def __init__(self, table=None, method="mean", window_days=DEFAULT_WINDOW_DAYS, min_count=DEFAULT_MIN_COUNT):
+        self.table = table if table is not None else pd.DataFrame(columns=RESULT_COLS)
+        self.method = method
+        self.window_days = window_days
+        self.min_count = min_count
+
+    @classmethod
+    def build(cls, frame, method="mean", window_days=DEFAULT_WINDOW_DAYS, min_count=DEFAULT_MIN_COUNT):
+        table = latest_deviations(frame, method, window_days, min_count)
+        return cls(table, method, window_days, min_count)
+
+    def update(self, frame, delta):
+        """delta の行がある選手について frame から計算し直す"""
+        if delta.empty:
+            return self
+        names = sorted(delta["name_norm"].astype(str).unique())
+        fresh = latest_deviations(select_rows(frame, names), self.method, self.window_days, self.min_count)
+        kept = self.table[~self.table["name_norm"].isin(names)]
+        table = pd.concat([kept, fresh], ignore_index=True) if not kept.empty else fresh
+        return BaselineAlerts(table, self.method, self.window_days, self.min_count)
+
+    def latest_day(self):
+        return self.table["measurement_date"].max() if not self.table.empty else None
+
+    def alerts(self, threshold=DEFAULT_THRESHOLD, day=None):
+        """day（省略時はチームの最新の記録日）に記録のある選手の |z| >= threshold の指標を |z| の大きい順に返す"""
+        day = self.latest_day() if day is None else pd.Timestamp(day).normalize()
+        table = self.table
+        if day is None or table.empty:
+            return table.assign(metric_ja=pd.Series(dtype="str"))
+        table = table[(table["measurement_date"] == day) & (table["z"].abs() >= threshold)]
+        table = table.assign(metric_ja=table["metric"].map(_METRIC_JA))
+        order = table["z"].abs().sort_values(ascending=False, kind="stable").index
+        return table.loc[order].reset_index(drop=True)
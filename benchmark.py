@@ -0,0 +1,254 @@
+"""合成データでの処理時間・メモリ計測（チームのデータが増えたときの確認用）
+
+例:
+    python benchmark.py --athletes 40 --since 2016
+    python benchmark.py --athletes 80 --lab-density 0.02 --text-density 0.3 --json bench.json
+
+metric_dict の列を持つ合成データ（Supabase から返る形の行リスト）を作り、
+アプリと同じ処理を段階ごとに実行して、時間（repeat 回の最小）とピークメモリを表示する。
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import unicodedata
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from charts import combined_chart, metric_chart, to_long
+from data_loader import normalize_names
+from downsample import DEFAULT_MAX_POINTS, downsample
+from rollup import MonthlyRollup
+from schema import CATEGORICAL_COLS, NON_NUMERIC_COLS, TEXT_COLS, apply_schema, axis_config, metric_dict
+from selection import select_rows, sort_team_frame
+from text_index import TextIndex
+from text_items import DEFAULT_TEXT_PAGE_SIZE, nonempty_text_rows
+
+# 血液・尿・HRV などの検査値（測定日がまばら）
+LAB_COLS = [
+    "d_roms", "bap", "bap_droms_ratio", "ck", "tp", "hf", "lf", "lf_hf_ratio",
+    "hb_conc", "hbmass", "hbmass_per_kg", "vo2max_per_kg", "pro", "cre", "ph", "sg",
+]
+
+SAMPLE_TEXTS = {
+    "notes": ["発熱あり", "右膝に違和感", "左足首の張り", "頭痛", "体調良好", "遠征移動日"],
+    "another": ["足首テーピング", "治療院", "補食あり"],
+    "remarks": ["遠征", "合宿", "試合", "オフ"],
+    "sleep_status": ["良好", "中途覚醒", "寝つき悪い"],
+    "stool_form": ["普通", "軟便", "硬便"],
+    "injury_location": ["右膝", "左膝", "腰", "右足首", "ハムストリング"],
+}
+
+CHART_METRICS = ["全般的な体調（mm）", "疲労感（mm）", "睡眠時間（h）", "体温（℃）", "SpO2（%）"]
+SEARCH_WORDS = ["発熱", "膝", "遠征"]
+
+
+# -----------------------------
+# 合成データ
+# -----------------------------
+def make_team_records(athletes=30, since=2016, until=None, lab_density=0.05, text_density=0.2,
+                      daily_density=0.9, seed=0):
+    """Supabase の select と同じ形（dict のリスト）の合成データ
+
+    since 年度の4月〜until 年度末（省略時は今日）まで、各選手が daily_density の割合の日に入力した想定。
+    検査値（LAB_COLS）は lab_density、テキスト列は text_density の割合の行にだけ値が入る。
+    """
+    rng = np.random.default_rng(seed)
+    last_day = pd.Timestamp.today().normalize()
+    if until is not None:
+        last_day = min(last_day, pd.Timestamp(f"{until + 1}-03-31"))
+    days = pd.date_range(f"{since}-04-01", last_day, freq="D")
+
+    # 全角スペース・空白の揺れを含む選手名
+    names = np.repeat([f"選手{'　' if i % 3 == 0 else ' '}{i:03d}" for i in range(athletes)], len(days))
+    dates = np.tile(days.to_numpy(), athletes)
+    keep = rng.random(len(names)) < daily_density
+    names, dates = names[keep], pd.DatetimeIndex(dates[keep])
+    n = len(names)
+
+    frame = pd.DataFrame({
+        "team": "BENCH",
+        "name": names,
+        "measurement_date": dates.strftime("%Y-%m-%d"),
+        "fiscal_year": np.where(dates.month >= 4, dates.year, dates.year - 1),
+    })
+    columns = dict(metric_dict)
+    columns.update((ja, col) for (ja, col) in TEXT_COLS if col not in metric_dict.values())
+    for metric_ja, col in columns.items():
+        if col in NON_NUMERIC_COLS:
+            choices = np.array(SAMPLE_TEXTS.get(col, SAMPLE_TEXTS["remarks"]), dtype=object)
+            values = rng.choice(choices, n)
+            filled = rng.random(n) < (text_density if col not in CATEGORICAL_COLS else 0.5)
+            frame[col] = np.where(filled, values, None)
+            continue
+        low, high = axis_config.get(metric_ja, {}).get("y_domain") or (0, 100)
+        values = np.round(rng.uniform(low, high, n), 3).astype(object)
+        density = lab_density if col in LAB_COLS else 0.95
+        values[rng.random(n) >= density] = None
+        frame[col] = values
+    frame["updated_at"] = dates.strftime("%Y-%m-%dT08:00:00")
+    return frame.to_dict("records")
+
+
+# -----------------------------
+# 段階ごとの処理（アプリと同じ関数を使う）
+# -----------------------------
+def stage_build(ctx):
+    ctx["frame"] = pd.DataFrame(ctx["records"])
+
+
+def stage_schema(ctx):
+    frame = apply_schema(ctx["frame"])
+    ctx["frame"] = frame.dropna(subset=["measurement_date"])
+
+
+def stage_normalize(ctx):
+    ctx["frame"]["name_norm"] = normalize_names(ctx["frame"]["name"])
+
+
+def stage_index(ctx):
+    ctx["frame"] = sort_team_frame(ctx["frame"])
+    ctx["rollup"] = MonthlyRollup.build(ctx["frame"])
+
+
+def stage_filter(ctx):
+    frame = ctx["frame"]
+    names = list(frame["name_norm"].cat.categories[:5])
+    end = frame["measurement_date"].max()
+    ctx["names"] = names
+    ctx["period"] = select_rows(frame, names, end - pd.Timedelta(days=365), end).copy()
+    ctx["period"]["name"] = ctx["period"]["name_norm"].cat.remove_unused_categories()
+
+    latest = int(frame["fiscal_year"].max())
+    ctx["fiscal_years"] = [latest - 1, latest]
+    ctx["months"] = list(range(1, 13))
+    by_name = select_rows(frame, names)
+    ctx["year_month"] = by_name[by_name["fiscal_year"].isin(ctx["fiscal_years"])]
+
+
+def _chart_frames(ctx):
+    period = ctx["period"]
+    frames = []
+    for metric_ja in CHART_METRICS:
+        col = metric_dict[metric_ja]
+        plot_df = period.loc[:, ["measurement_date", "name", col]].dropna().sort_values("measurement_date")
+        frames.append((metric_ja, col, downsample(plot_df, "measurement_date", col, "name", DEFAULT_MAX_POINTS)))
+    return frames
+
+
+# st.altair_chart と同じく行数の上限（既定 5000 行）なしで Vega-Lite の JSON にする
+def stage_charts(ctx):
+    with alt.data_transformers.disable_max_rows():
+        ctx["specs"] = [
+            metric_chart(chart_df, col, metric_ja).to_dict() for metric_ja, col, chart_df in _chart_frames(ctx)
+        ]
+
+
+def stage_combined_chart(ctx):
+    long_df = to_long(_chart_frames(ctx))
+    with alt.data_transformers.disable_max_rows():
+        ctx["combined_spec"] = combined_chart(long_df, CHART_METRICS).to_dict()
+
+
+def stage_summary(ctx):
+    period = ctx["period"]
+    ctx["summaries"] = []
+    for metric_ja in CHART_METRICS:
+        col = metric_dict[metric_ja]
+        ctx["summaries"].append(period.groupby("name", observed=True)[col].agg(["count", "mean", "min", "max"]))
+        ctx["summaries"].append(
+            ctx["rollup"].summarize(col, ctx["names"], ctx["fiscal_years"], ctx["months"], by="name")
+        )
+
+
+def stage_text_table(ctx):
+    texts = nonempty_text_rows(ctx["period"], [col for (_, col) in TEXT_COLS])
+    page = texts.iloc[:DEFAULT_TEXT_PAGE_SIZE]
+    rows = ctx["period"].loc[page.index]
+    ctx["text_page"] = pd.DataFrame({"measurement_date": rows["measurement_date"].dt.strftime("%Y-%m-%d")}).join(page)
+
+
+def stage_text_search(ctx):
+    index = TextIndex.build(ctx["frame"], [col for (_, col) in TEXT_COLS])
+    ctx["hits"] = [len(index.search(word)) for word in SEARCH_WORDS]
+
+
+STAGES = [
+    ("DataFrame 作成", stage_build),
+    ("型変換", stage_schema),
+    ("名前の正規化", stage_normalize),
+    ("並べ替え・月集計", stage_index),
+    ("抽出", stage_filter),
+    ("グラフ（指標ごと）", stage_charts),
+    ("グラフ（まとめて）", stage_combined_chart),
+    ("サマリー表", stage_summary),
+    ("テキスト表", stage_text_table),
+    ("テキスト索引・検索", stage_text_search),
+]
+
+
+def run_pipeline(records, repeat=3):
+    """各段階の時間（repeat 回の最小・秒）とピークメモリ（MB）を返す"""
+    seconds = {label: float("inf") for label, _ in STAGES}
+    for _ in range(repeat):
+        ctx = {"records": records}
+        for label, stage in STAGES:
+            start = time.perf_counter()
+            stage(ctx)
+            seconds[label] = min(seconds[label], time.perf_counter() - start)
+
+    # メモリは計測の負荷で時間が変わるので、別の1回で測る
+    peak_mb = {}
+    ctx = {"records": records}
+    for label, stage in STAGES:
+        tracemalloc.start()
+        stage(ctx)
+        peak_mb[label] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+    return [
+        {"stage": label, "seconds": round(seconds[label], 4), "peak_mb": round(peak_mb[label], 1)}
+        for label, _ in STAGES
+    ]
+
+
+def _pad(text, width):
+    """全角文字を2桁と数えて width 桁に左寄せする"""
+    used = sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+    return text + " " * max(width - used, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--athletes", type=int, default=30)
+    parser.add_argument("--since", type=int, default=2016, help="最初の年度")
+    parser.add_argument("--until", type=int, default=None, help="最後の年度（省略時は今日まで）")
+    parser.add_argument("--lab-density", type=float, default=0.05, help="検査値が入っている行の割合")
+    parser.add_argument("--text-density", type=float, default=0.2, help="自由記述が入っている行の割合")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    records = make_team_records(
+        args.athletes, args.since, args.until, args.lab_density, args.text_density, seed=args.seed
+    )
+    print(f"合成データ：{len(records)} 行（{args.athletes} 人・{args.since}年度〜）"
+          f" 作成 {time.perf_counter() - start:.1f} 秒")
+
+    results = run_pipeline(records, args.repeat)
+    width = 20
+    for r in results:
+        print(f"{_pad(r['stage'], width)}  {r['seconds'] * 1000:9.1f} ms  {r['peak_mb']:8.1f} MB")
+    print(f"{_pad('合計', width)}  {sum(r['seconds'] for r in results) * 1000:9.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"rows": len(records), "args": vars(args), "stages": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
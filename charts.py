@@ -0,0 +1,144 @@
+"""グラフ（Altair）の組み立て"""
+import altair as alt
+import pandas as pd
+
+from schema import axis_config
+
+x_axis_format = "%Y-%m-%d"
+
+YEAR_COL = "fiscal_year"
+
+
+def add_overlay_columns(plot_df):
+    """同一選手比較 × 年度+月 用に、年度-月ラベルと月日を2000年に揃えた overlay_date を付ける"""
+    plot_df["month"] = plot_df["measurement_date"].dt.month
+    plot_df["year_month_label"] = plot_df[YEAR_COL].astype(str) + "-" + plot_df["month"].astype(str)
+
+    plot_df["overlay_date"] = pd.to_datetime(
+        "2000-" + plot_df["measurement_date"].dt.strftime("%m-%d"),
+        errors="coerce"
+    )
+    plot_df = plot_df.dropna(subset=["overlay_date", "year_month_label"])
+    plot_df["group_key"] = plot_df["year_month_label"]
+    return plot_df
+
+
+def y_scale_and_axis(metric_ja):
+    """axis_config から y 軸のスケールと目盛りを作る"""
+    cfg = axis_config.get(metric_ja, {"y_domain": None, "y_zero": False, "tick_step": None})
+    y_domain  = cfg.get("y_domain", None)
+    y_zero    = cfg.get("y_zero", False)
+    tick_step = cfg.get("tick_step", None)
+
+    y_scale = alt.Scale(domain=y_domain, zero=y_zero) if y_domain else alt.Scale(zero=y_zero)
+
+    y_axis = alt.Axis()
+    if y_domain and tick_step:
+        y_min, y_max = y_domain
+        ticks = []
+        v = y_min
+        while v <= y_max + 1e-9:
+            ticks.append(round(v, 6))
+            v += tick_step
+        y_axis = alt.Axis(values=ticks)
+    return y_scale, y_axis
+
+
+def _encodings(y_field, metric_ja, overlay):
+    """折れ線の encode 引数（overlay=True は年度-月で色分けして月日で重ね描き）"""
+    y_scale, y_axis = y_scale_and_axis(metric_ja)
+    y = alt.Y(f"{y_field}:Q", title=metric_ja, scale=y_scale, axis=y_axis)
+    if overlay:
+        return dict(
+            x=alt.X("overlay_date:T", title="月日", axis=alt.Axis(format="%m-%d")),
+            y=y,
+            color=alt.Color("year_month_label:N", title="年度-月"),
+            detail=alt.Detail("group_key:N"),
+            tooltip=[
+                alt.Tooltip("year_month_label:N", title="年度-月"),
+                alt.Tooltip("measurement_date:T", title="測定日", format=x_axis_format),
+                alt.Tooltip(f"{y_field}:Q", title=metric_ja),
+            ],
+        )
+    return dict(
+        x=alt.X("measurement_date:T", title="測定日", axis=alt.Axis(format=x_axis_format)),
+        y=y,
+        color=alt.Color("name:N", title="選手"),
+        tooltip=[
+            alt.Tooltip("name:N", title="選手"),
+            alt.Tooltip("measurement_date:T", title="測定日", format=x_axis_format),
+            alt.Tooltip(f"{y_field}:Q", title=metric_ja),
+        ],
+    )
+
+
+def metric_chart(chart_df, col, metric_ja, overlay=False, zoom_name=None):
+    """1指標の折れ線グラフ（複数を1つの spec に並べるときは zoom_name を別々にする）"""
+    return (
+        alt.Chart(chart_df)
+        .mark_line(point=True)
+        .encode(**_encodings(col, metric_ja, overlay))
+        .properties(height=300)
+        .interactive(name=zoom_name)
+    )
+
+
+# -----------------------------
+# 複数指標を1つのグラフにまとめる
+# -----------------------------
+def to_long(chart_frames, overlay=False):
+    """[(指標名, 列名, chart_df), ...] を (…, metric, value) の縦持ちにまとめる"""
+    id_cols = ["measurement_date", "name"]
+    if overlay:
+        id_cols += ["overlay_date", "year_month_label", "group_key"]
+    parts = []
+    for metric_ja, col, chart_df in chart_frames:
+        part = chart_df.loc[:, id_cols + [col]].rename(columns={col: "value"})
+        part["name"] = part["name"].astype(str)
+        part["metric"] = metric_ja
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def combined_chart(long_df, metrics_ja, overlay=False, height=220):
+    """指標ごとの折れ線を縦に並べた1つのグラフ
+
+    データは最上位に1回だけ埋め込み、各段は metric で絞り込む。
+    y 軸は指標ごと（axis_config）、x 軸は全段で共有してズーム・パンを連動させる。
+    """
+    rows = [
+        alt.Chart()
+        .mark_line(point=True)
+        .transform_filter(alt.datum.metric == metric_ja)
+        .encode(**_encodings("value", metric_ja, overlay))
+        .properties(height=height)
+        .add_params(alt.selection_interval(bind="scales", encodings=["x"], name=f"zoom_{i}"))
+        for i, metric_ja in enumerate(metrics_ja)
+    ]
+    # x のスケールを共有しているので、どの段でズームしても全段に反映される
+    return alt.vconcat(*rows, data=long_df).resolve_scale(x="shared", y="independent", color="shared")
+
+
+# -----------------------------
+# チーム全体のヒートマップ
+# -----------------------------
+def heatmap_chart(long_df, names, metric_ja, row_height=14):
+    """選手 × 測定日 のマスを指標の値で塗る1つの rect グラフ（long_df は HeatmapMatrix.to_long()）"""
+    cfg = axis_config.get(metric_ja, {})
+    domain = cfg.get("y_domain")
+    color_scale = alt.Scale(scheme="viridis", domain=domain) if domain else alt.Scale(scheme="viridis")
+    return (
+        alt.Chart(long_df)
+        .mark_rect()
+        .encode(
+            x=alt.X("measurement_date:T", timeUnit="yearmonthdate", title="測定日", axis=alt.Axis(format=x_axis_format)),
+            y=alt.Y("name:N", title="選手", sort=list(names)),
+            color=alt.Color("value:Q", title=metric_ja, scale=color_scale),
+            tooltip=[
+                alt.Tooltip("name:N", title="選手"),
+                alt.Tooltip("measurement_date:T", title="測定日", format=x_axis_format),
+                alt.Tooltip("value:Q", title=metric_ja, format=".2f"),
+            ],
+        )
+        .properties(height=max(row_height * len(names), 120))
+    )
@@ -0,0 +1,797 @@
+"""Supabase からのチームデータ取得とキャッシュ"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+import pandas as pd
+from postgrest.exceptions import APIError
+
+from baseline import SOURCE_COLS as BASELINE_SOURCE_COLS, BaselineAlerts
+from rollup import MonthlyRollup
+from schema import apply_schema
+from selection import SORT_COLS, select_rows, sort_team_frame
+from text_index import TextIndex
+from training_load import SOURCE_COLS as LOAD_SOURCE_COLS, TrainingLoad
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SEC = 600
+# ライブ更新のスナップショット保存の最短間隔（その間に届いた行はまとめて1回で保存する）
+DEFAULT_SNAPSHOT_INTERVAL_SEC = 30
+DEFAULT_MAX_CACHE_ENTRIES = 256
+
+# ページ取得（PostgREST の max-rows 上限で切り捨てられないよう .range() で分割）
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_FETCH_WORKERS = 4
+# ページ境界がぶれないよう、常に同じ順序で並べてから分割する
+PAGE_ORDER_COLS = ["measurement_date", "name"]
+
+# 差分同期の取得中に列が追加されたときに取り直す回数
+SYNC_ATTEMPTS = 3
+
+# 差分同期で upsert するときのキー
+UPSERT_KEY = ["name", "measurement_date"]
+
+# 列の遅延取得：最初は常にこの列だけを取得し、指標・テキスト列は使うときに追加取得する
+# （updated_at で差分同期したい場合はここに加える）
+KEY_COLUMNS = ["name", "measurement_date", "fiscal_year", "team"]
+
+
+# -----------------------------
+# 取得
+# -----------------------------
+FetchReport = namedtuple("FetchReport", ["rows", "expected", "pages", "seconds"])
+
+# (テーブル, チーム) → 直近の FetchReport（取得件数の確認表示用）
+fetch_reports = {}
+
+
+def fetch_team_rows(client, table_name, team, columns="*", since=None, since_col="measurement_date",
+                    filters=(), page_size=DEFAULT_PAGE_SIZE, max_workers=DEFAULT_FETCH_WORKERS):
+    """チームの行をページ単位で並列取得し、(行のリスト, FetchReport) を返す
+
+    1ページ目で count="exact" の総件数を受け取り、残りのページを
+    max_workers 本のスレッドで同時に取得して元の順序で連結する。
+    since を渡すと since_col >= since の行だけを取得する（差分同期用）。
+    filters は build_filters() の (メソッド, 列, 値) で、サーバ側の絞り込みに使う。
+    """
+    def build_query(count=None):
+        query = client.table(table_name).select(columns, count=count).eq("team", team)
+        if since is not None:
+            query = query.gte(since_col, since)
+        for method, col, value in filters:
+            query = getattr(query, method)(col, value)
+        for col in PAGE_ORDER_COLS:
+            query = query.order(col)
+        return query
+
+    def fetch_page(start):
+        return build_query().range(start, start + page_size - 1).execute().data
+
+    started = time.perf_counter()
+    first = build_query(count="exact").range(0, page_size - 1).execute()
+    rows = list(first.data)
+    expected = first.count if first.count is not None else len(rows)
+
+    # サーバ側の上限が page_size より小さいときは、実際に返ってきた件数をページ幅にする
+    if 0 < len(rows) < min(page_size, expected):
+        page_size = len(rows)
+
+    starts = list(range(page_size, expected, page_size))
+    if starts:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for page in pool.map(fetch_page, starts):
+                rows.extend(page)
+
+    report = FetchReport(len(rows), expected, 1 + len(starts), time.perf_counter() - started)
+    if report.rows != report.expected:
+        logger.warning("%s/%s: %d rows fetched, %d expected", table_name, team, report.rows, report.expected)
+    return rows, report
+
+
+def fetch_team_frame(client, table_name, team, columns="*", since=None, since_col="measurement_date",
+                     filters=(), **fetch_opts):
+    """チームの行を Supabase から取得して DataFrame にする（fetch_opts は fetch_team_rows へ）"""
+    rows, report = fetch_team_rows(
+        client, table_name, team, columns=columns, since=since, since_col=since_col, filters=filters,
+        **fetch_opts
+    )
+    if since is None and not filters:
+        fetch_reports[(table_name, team)] = report
+    return pd.DataFrame(rows)
+
+
+def build_filters(names=None, date_from=None, date_to=None, fiscal_years=None):
+    """選手・期間・年度の選択をサーバ側フィルタ (メソッド, 列, 値) のタプルにする
+
+    names は正規化前の name の値。戻り値はそのままキャッシュキーに使える。
+    """
+    filters = []
+    if names is not None:
+        filters.append(("in_", "name", tuple(sorted(names))))
+    if date_from is not None:
+        filters.append(("gte", "measurement_date", pd.Timestamp(date_from).strftime("%Y-%m-%d")))
+    if date_to is not None:
+        filters.append(("lte", "measurement_date", pd.Timestamp(date_to).strftime("%Y-%m-%d")))
+    if fiscal_years is not None:
+        filters.append(("in_", "fiscal_year", tuple(sorted(int(y) for y in fiscal_years))))
+    return tuple(filters)
+
+
+# -----------------------------
+# 測定日と name 正規化（スペース揺れ対策）
+# -----------------------------
+def normalize_name(x: str) -> str:
+    """前後空白除去 + 全角スペース→半角 + 連続空白→1つ"""
+    if pd.isna(x):
+        return ""
+    s = str(x).strip()
+    s = s.replace("\u3000", " ")
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def normalize_names(names):
+    """name 列を正規化して Categorical で返す
+
+    選手名の種類は数十程度なので、正規化は重複のない値ごとに1回だけ行い、
+    行ごとの値は整数コードの付け替えで作る（カテゴリは名前順）。
+    """
+    codes, uniques = pd.factorize(names)
+    # 欠損（コード -1）は normalize_name と同じく "" にする
+    normalized = [normalize_name(u) for u in uniques] + [""]
+    codes = np.where(codes < 0, len(uniques), codes)
+    remap, categories = pd.factorize(pd.Index(normalized, dtype=object), sort=True)
+    return pd.Categorical.from_codes(remap[codes], categories=categories).remove_unused_categories()
+
+
+def prepare_frame(df, report=None):
+    """取得直後の DataFrame に型変換（schema.COLUMN_TYPES）と name_norm 付与を行う
+
+    report は apply_schema() へ渡す（変換できなかった件数の集計用）。
+    """
+    if df.empty:
+        return df
+    df = apply_schema(df, report)
+    df = df.dropna(subset=["measurement_date"])
+    df["name_norm"] = normalize_names(df["name"])
+    return df
+
+
+# -----------------------------
+# 差分同期
+# -----------------------------
+def sync_column(df):
+    """高水位線に使う列（updated_at があればそちら、なければ測定日）"""
+    return "updated_at" if "updated_at" in df.columns else "measurement_date"
+
+
+def high_water_mark(df, col):
+    """前回同期済みの最大値（Supabase へ渡せる文字列）"""
+    if df.empty or col not in df.columns:
+        return None
+    if col == "measurement_date":
+        return df[col].max().strftime("%Y-%m-%d")
+    return df[col].dropna().astype(str).max()
+
+
+def merge_rows(base, new, key=UPSERT_KEY):
+    """key が一致する行を new で置き換え、それ以外の new の行は追加する"""
+    if new.empty:
+        return base
+    if base.empty:
+        return new.reset_index(drop=True)
+    replaced = pd.MultiIndex.from_frame(base[key]).isin(pd.MultiIndex.from_frame(new[key]))
+    merged = pd.concat([base[~replaced], new], ignore_index=True)
+    # カテゴリが異なる Categorical 同士の連結は object になるので付け直す
+    if "name_norm" in merged.columns:
+        merged["name_norm"] = merged["name_norm"].astype("category")
+    return apply_schema(merged)
+
+
+def changed_rows(base, new, key=UPSERT_KEY):
+    """new のうち、base に key も値も同じ行があるもの（取り直しただけの行）を除く
+
+    base にない列を持つ new は比べられないので、そのまま返す（遅延取得・pushdown で未取得の列が変わった行など）。
+    """
+    if new.empty or base.empty or not new.columns.isin(base.columns).all():
+        return new
+    cols = [c for c in new.columns if c in base.columns and c not in key]
+    # 比べるのは new と同じ測定日の行だけ
+    old = base[base["measurement_date"].isin(new["measurement_date"].unique())]
+    old = old.drop_duplicates(subset=key, keep="last").set_index(key)[cols]
+    pos = old.index.get_indexer(pd.MultiIndex.from_frame(new[key]))
+    found = pos >= 0
+    same = found.copy()
+    for c in cols:
+        a = old[c].to_numpy(dtype=object)[pos[found]]
+        b = new[c].to_numpy(dtype=object)[found]
+        # pd.NA との == は真偽にできないので、両方に値がある所だけを比べる
+        a_na, b_na = pd.isna(a), pd.isna(b)
+        equal = a_na & b_na
+        both = ~a_na & ~b_na
+        equal[both] = np.asarray(a[both] == b[both], dtype=bool)
+        same[found] &= equal
+    return new[~same]
+
+
+def sync_team_frame(client, table_name, team, prev, columns="*", report=None, **fetch_opts):
+    """prev 以降に追加・更新された行だけを取得して prev にマージし、(マージ結果, 取得した行) を返す
+
+    高水位線の当日分は取りこぼさないよう >= で取り直す（変わっていない行は changed_rows() で除くので、
+    変更がなければ prev をそのまま返す）。
+    測定日を高水位線にしている場合、過去日の修正は拾えないので「全件再取得」を使う。
+    """
+    col = sync_column(prev)
+    since = high_water_mark(prev, col)
+    if since is None:
+        frame = prepare_frame(
+            fetch_team_frame(client, table_name, team, columns=columns, **fetch_opts), report
+        )
+        return frame, frame
+    delta = prepare_frame(
+        fetch_team_frame(client, table_name, team, columns=columns, since=since, since_col=col, **fetch_opts),
+        report,
+    )
+    delta = changed_rows(prev, delta)
+    return merge_rows(prev, delta), delta
+
+
+# -----------------------------
+# スナップショット（Parquet）
+# -----------------------------
+def snapshot_path(snapshot_dir, table_name, team, shape):
+    """(テーブル, チーム, クエリ形) ごとのスナップショットのパス"""
+    name = "__".join(str(p) for p in (table_name, team, shape))
+    name = re.sub(r'[\\/:*?"<>|\s]', "_", name)
+    return os.path.join(snapshot_dir, f"{name}.parquet")
+
+
+def write_snapshot(df, path):
+    """正規化・型変換済みの frame を書き出す（一時ファイル経由で置き換え）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def read_snapshot(path):
+    """スナップショットを読み込む（なければ None）"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def remove_snapshot(path):
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+# -----------------------------
+# 列の遅延取得
+# -----------------------------
+def join_columns(base, extra, key=UPSERT_KEY):
+    """key で extra の列を base に付け足す（base の行と index はそのまま）"""
+    extra = extra.copy()
+    extra["measurement_date"] = pd.to_datetime(extra["measurement_date"], errors="coerce")
+    extra = extra.drop_duplicates(subset=key, keep="last").set_index(key)
+    return base.join(extra, on=key)
+
+
+class TeamTable:
+    """チーム 1 つ分の取得済みデータ
+
+    lazy_columns=True のときは KEY_COLUMNS だけで読み込み、
+    ensure_columns() で要求された列を初回だけ追加取得して frame に保持する。
+    snapshot_path を渡すと、取得・同期のたびに frame を Parquet に保存し、
+    open() では保存済みのものから即座に表示を始める。
+    frame は常に sort_team_frame() の順（選手 → 測定日）に保つ（selection.select_rows() の前提）。
+    rollup は frame の月単位集計で、frame と一緒に更新する。
+    text_index はテキスト列の検索インデックス、training_load は負荷指標（ACWR など）の表、
+    baselines は (方式, 日数) ごとの個人ベースラインからの逸脱の表で、
+    いずれも ensure_*() で初めて作り、以降は同期のたびに更新する。
+    ただし baselines は、指標列が frame にないときは直近の日数分だけを別に取得して baseline_rows に持ち（frame には足さない）、
+    同期で行が変わったら、届いた行に指標列があればそれを、なければ変わった選手の分だけを取り直して baseline_rows にマージし、更新する。
+    version は frame の値が変わる（読み込み・同期で行が変わる）たびに増える番号で、
+    frame から作ったものを外でキャッシュするときのキーに使う。
+    選手ごとの版は data_version() で引ける（変更のなかった選手の分はキャッシュを使い続けられる）。
+    frame は差し替え方式で更新するので、読み出した DataFrame 自体は変更しないこと。
+    """
+
+    def __init__(self, client, table_name, team, lazy_columns=True, snapshot_path=None,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL_SEC, **fetch_opts):
+        self.client = client
+        self.table_name = table_name
+        self.team = team
+        self.lazy_columns = lazy_columns
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.fetch_opts = fetch_opts
+        self.frame = pd.DataFrame()
+        self.rollup = MonthlyRollup()
+        self.text_index = None
+        self.training_load = None
+        self.baselines = {}
+        # baselines 用に別取得した直近の指標列（sort_team_frame() の順）/ その開始日 / 取り直しが必要な選手
+        self.baseline_rows = None
+        self.baseline_since = None
+        self._baseline_stale = set()
+        self.version = 0
+        # 選手 → その選手の行が最後に変わったときの version（読み込み以降に変わっていなければ loaded_version）
+        self.athlete_versions = {}
+        self.loaded_version = 0
+        # ライブ更新（apply_rows）で受け取った行数
+        self.live_rows = 0
+        # テーブルに存在しなかった列（再要求しない）
+        self.missing_columns = set()
+        # スナップショットを表示中でサーバと未同期か / 直近の同期で起きたエラー（オフライン表示用）
+        self.from_snapshot = False
+        self.last_error = None
+        # 型変換できずに欠損になった件数（列ごと）
+        self.coercion_failures = {}
+        self._lock = threading.Lock()
+        self._snapshot_saved_at = float("-inf")
+        self._snapshot_timer = None
+        self._snapshot_lock = threading.Lock()
+
+    def _select_columns(self):
+        if not self.lazy_columns:
+            return "*"
+        if self.frame.empty:
+            return ",".join(KEY_COLUMNS)
+        return ",".join(c for c in self.frame.columns if c != "name_norm")
+
+    def _save_snapshot(self):
+        if self.snapshot_path is None:
+            return
+        try:
+            write_snapshot(self.frame, self.snapshot_path)
+            self._snapshot_saved_at = time.monotonic()
+        except Exception:
+            logger.exception("%s/%s: failed to write snapshot", self.table_name, self.team)
+
+    def _save_snapshot_later(self):
+        """前回の保存から snapshot_interval 秒たってから保存する（その間の変更はまとめて1回で保存）"""
+        if self.snapshot_path is None:
+            return
+        with self._snapshot_lock:
+            if self._snapshot_timer is not None:
+                return
+            delay = max(0.0, self._snapshot_saved_at + self.snapshot_interval - time.monotonic())
+            self._snapshot_timer = threading.Timer(delay, self._flush_snapshot)
+            self._snapshot_timer.daemon = True
+            self._snapshot_timer.start()
+
+    def _flush_snapshot(self):
+        with self._snapshot_lock:
+            self._snapshot_timer = None
+        self._save_snapshot()
+
+    def load(self):
+        """全件取得（遅延モードでは KEY_COLUMNS のみ）
+
+        取得と型変換はロックの外で行い、終わってから frame を差し替える（その間も snapshot() は待たない）。
+        取得中に行が届いたり列が追加されたりしていたら、差し替えたあとに差分同期・列の取得で取り直す。
+        """
+        with self._lock:
+            columns = self._select_columns()
+            version = self.version
+        coercion_failures = {}
+        frame = sort_team_frame(prepare_frame(fetch_team_frame(
+            self.client, self.table_name, self.team, columns=columns, **self.fetch_opts
+        ), coercion_failures))
+        with self._lock:
+            changed = self.version != version
+            added_columns = [c for c in self.frame.columns if c not in frame.columns]
+            self.coercion_failures = coercion_failures
+            self.frame = frame
+            self.rollup = MonthlyRollup.build(self.frame)
+            self.text_index = None
+            self.training_load = None
+            self.baselines = {}
+            self.baseline_rows = None
+            self.baseline_since = None
+            self._baseline_stale = set()
+            self._reset_versions()
+            self.from_snapshot = False
+            self.last_error = None
+        self._save_snapshot()
+        if changed:
+            if added_columns:
+                self.ensure_columns(added_columns)
+            self.sync()
+        return self
+
+    def _reset_versions(self):
+        self.version += 1
+        self.loaded_version = self.version
+        self.athlete_versions = {}
+
+    def _apply_delta(self, merged, delta, rows=None):
+        """delta をマージした結果 merged を frame にし、集計・索引などを delta の分だけ更新する（ロック内で呼ぶ）
+
+        rows は frame の列に絞る前の delta（ライブ更新で受け取った行）で、baseline_rows の更新に使う。
+        """
+        prev_empty = self.frame.empty
+        self.frame = sort_team_frame(merged)
+        if prev_empty:
+            self.rollup = MonthlyRollup.build(self.frame)
+        else:
+            self.rollup = self.rollup.update(self.frame, delta)
+        if self.text_index is not None:
+            self.text_index.update(delta)
+        if self.training_load is not None:
+            self.training_load = self.training_load.update(self.frame, delta)
+        if self._has_columns(BASELINE_SOURCE_COLS):
+            self.baselines = {key: b.update(self.frame, delta) for key, b in self.baselines.items()}
+        elif self.baseline_rows is not None:
+            self._update_baseline_rows(delta if rows is None else rows)
+        self.version += 1
+        for name in delta["name_norm"].astype(str).unique():
+            self.athlete_versions[name] = self.version
+
+    def _update_baseline_rows(self, rows):
+        """rows に指標列があれば baseline_rows にマージして baselines を更新し、なければその選手を取り直し待ちにする"""
+        cols = [c for c in BASELINE_SOURCE_COLS if c not in self.missing_columns]
+        if not all(c in rows.columns for c in cols):
+            self._baseline_stale.update(rows["name_norm"].astype(str).unique())
+            return
+        rows = rows[UPSERT_KEY + ["name_norm"] + cols]
+        self.baseline_rows = sort_team_frame(merge_rows(self.baseline_rows, rows))
+        self.baselines = {key: b.update(self.baseline_rows, rows) for key, b in self.baselines.items()}
+
+    def _has_columns(self, cols):
+        """cols が frame にそろっているか（テーブルにない列は除く）"""
+        return all(c in self.frame.columns or c in self.missing_columns for c in cols)
+
+    def snapshot(self):
+        """(version, frame) を揃えて返す（frame から作ったものを version をキーにキャッシュするとき用）"""
+        with self._lock:
+            return self.version, self.frame
+
+    def data_version(self, names):
+        """names の選手の行の版（どれかの選手の行が変わると変わる）"""
+        return tuple(self.athlete_versions.get(str(n), self.loaded_version) for n in names)
+
+    def apply_rows(self, records):
+        """受け取った行（Supabase の行の dict のリスト）を frame にマージする（ライブ更新用）
+
+        読み込み前なら何もしない。遅延モードで未取得の列は捨てる（あとで ensure_columns() が取り直す）。
+        スナップショットは snapshot_interval 秒に1回まとめて保存する。
+        """
+        if not records:
+            return self
+        with self._lock:
+            if self.frame.empty:
+                return self
+            delta = prepare_frame(pd.DataFrame(records), self.coercion_failures)
+            if delta.empty:
+                return self
+            # 未取得の列が変わった行も、版を上げて外のキャッシュ（pushdown の結果など）を作り直させる
+            delta = changed_rows(self.frame, delta)
+            if delta.empty:
+                return self
+            rows = delta
+            delta = delta[[c for c in delta.columns if c in self.frame.columns]]
+            self._apply_delta(merge_rows(self.frame, delta), delta, rows)
+            self.live_rows += len(delta)
+        self._save_snapshot_later()
+        return self
+
+    def sync(self):
+        """取得済みの列について差分同期する（失敗しても手元の frame で表示を続ける）
+
+        取得はロックの外で行い、マージ結果の差し替えだけをロック内で行う。
+        取得中にライブ更新で行が変わっていたら今の frame にマージし直し、
+        列が追加されていたら（取得した行にその列がないので）取り直す。
+        """
+        for _ in range(SYNC_ATTEMPTS):
+            with self._lock:
+                prev, columns = self.frame, self._select_columns()
+            try:
+                synced, delta = sync_team_frame(
+                    self.client, self.table_name, self.team, prev,
+                    columns=columns, report=self.coercion_failures, **self.fetch_opts
+                )
+            except Exception as e:
+                logger.exception("%s/%s: sync failed", self.table_name, self.team)
+                self.last_error = e
+                return self
+            with self._lock:
+                current = self.frame
+                if current is not prev:
+                    if not prev.columns.isin(current.columns).all() or not current.columns.isin(prev.columns).all():
+                        continue
+                    delta = changed_rows(current, delta)
+                    synced = merge_rows(current, delta)
+                if synced is not current:
+                    self._apply_delta(synced, delta)
+                self.from_snapshot = False
+                self.last_error = None
+            if self.frame is not current:
+                self._save_snapshot()
+            return self
+        logger.warning("%s/%s: columns kept changing during sync, retrying later", self.table_name, self.team)
+        return self
+
+    def _reload(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.exception("%s/%s: reload failed", self.table_name, self.team)
+            self.last_error = e
+
+    def open(self, reconcile="delta"):
+        """スナップショットがあれば読み込み、サーバとの突き合わせは裏のスレッドで行う
+
+        reconcile="delta" なら差分同期、"full" なら全件取得で突き合わせる。
+        スナップショットがなければ load() と同じ。
+        """
+        frame = None
+        if self.snapshot_path is not None:
+            try:
+                frame = read_snapshot(self.snapshot_path)
+            except Exception:
+                logger.exception("%s/%s: failed to read snapshot", self.table_name, self.team)
+        if frame is None or frame.empty:
+            return self.load()
+
+        self.frame = sort_team_frame(frame)
+        self.rollup = MonthlyRollup.build(self.frame)
+        self._reset_versions()
+        self.from_snapshot = True
+        target = self.sync if reconcile == "delta" else self._reload
+        threading.Thread(target=target, daemon=True).start()
+        return self
+
+    def _fetch_columns(self, cols, filters=()):
+        """cols を (name, measurement_date) 付きで取得する。存在しない列は missing_columns に記録して除く"""
+        cols = [c for c in dict.fromkeys(cols) if c not in self.missing_columns]
+        if not cols:
+            return []
+
+        def fetch(part):
+            extra = fetch_team_frame(
+                self.client, self.table_name, self.team, columns=",".join(UPSERT_KEY + part),
+                filters=filters, **self.fetch_opts
+            )
+            # キー列は frame 側で集計済みなので、追加した列だけを変換・集計する
+            return apply_schema(extra, self.coercion_failures, columns=part)
+
+        try:
+            return [fetch(cols)]
+        except APIError:
+            # 存在しない列が混ざっていると全体がエラーになるので 1 列ずつ取り直す
+            extras = []
+            for col in cols:
+                try:
+                    extras.append(fetch([col]))
+                except APIError:
+                    logger.warning("%s: column %r not found", self.table_name, col)
+                    self.missing_columns.add(col)
+            return extras
+
+    def ensure_columns(self, cols):
+        """未取得の列を取得して frame に追加し、追加できた列のリストを返す"""
+        if not self.lazy_columns:
+            return []
+        with self._lock:
+            need = [c for c in cols if c not in self.frame.columns]
+            if not need or self.frame.empty:
+                return []
+            frame = self.frame
+            try:
+                extras = self._fetch_columns(need)
+            except httpx.TransportError as e:
+                # 繋がらないときは手元の列だけで表示を続ける（列がない指標は「見つかりません」になる）
+                logger.warning("%s/%s: failed to fetch columns %r: %s", self.table_name, self.team, need, e)
+                self.last_error = e
+                return []
+            for extra in extras:
+                if not extra.empty:
+                    frame = join_columns(frame, extra)
+            added = [c for c in dict.fromkeys(need) if c in frame.columns]
+            self.frame = frame
+            self.rollup = self.rollup.add_columns(frame, added)
+        if added:
+            self._save_snapshot()
+        return added
+
+    def fetch_filtered(self, cols, filters):
+        """filters で絞った行について cols を取得する（frame には追加しない）
+
+        (name, measurement_date) と取得できた列を持つ DataFrame を返す（繋がらないときはキー列だけ）。
+        """
+        try:
+            extras = [e for e in self._fetch_columns(cols, filters=filters) if not e.empty]
+        except httpx.TransportError as e:
+            logger.warning("%s/%s: failed to fetch filtered columns: %s", self.table_name, self.team, e)
+            self.last_error = e
+            extras = []
+        if not extras:
+            return pd.DataFrame(columns=UPSERT_KEY)
+        result = extras[0]
+        for extra in extras[1:]:
+            result = result.merge(extra, on=UPSERT_KEY, how="outer")
+        return result
+
+    def ensure_text_index(self, cols):
+        """cols（テキスト列）の検索インデックスを返す（初回は列の取得とチーム全期間の登録を行う）"""
+        self.ensure_columns(cols)
+        with self._lock:
+            cols = [c for c in cols if c in self.frame.columns]
+            if self.text_index is None or self.text_index.cols != cols:
+                self.text_index = TextIndex.build(self.frame, cols)
+            return self.text_index
+
+    def ensure_training_load(self):
+        """負荷指標の表を返す（初回は元の列の取得とチーム全期間の計算を行う）"""
+        self.ensure_columns(LOAD_SOURCE_COLS)
+        with self._lock:
+            if self.training_load is not None:
+                return self.training_load
+            training_load = TrainingLoad.build(self.frame)
+            # 列を取得できなかった（繋がらない）ときは保持せず、次の呼び出しで取り直す
+            if self._has_columns(LOAD_SOURCE_COLS):
+                self.training_load = training_load
+            return training_load
+
+    def ensure_baselines(self, method, window_days):
+        """個人ベースラインからの逸脱の表を返す
+
+        指標列が frame にそろっていればそこから計算する。なければチームの最新の記録日から
+        window_days 日前以降の行の指標列だけをサーバ側で絞って取得し、baseline_rows に持って計算する（frame には足さない）。
+        以降は同期で行が変わった選手の分だけを取り直し、baseline_rows と表を更新する。
+        """
+        key = (method, window_days)
+        with self._lock:
+            frame = self.frame
+            if frame.empty or self._has_columns(BASELINE_SOURCE_COLS):
+                if key not in self.baselines:
+                    self.baselines[key] = BaselineAlerts.build(frame, method, window_days)
+                return self.baselines[key]
+            stale = sorted(self._baseline_stale)
+            if key in self.baselines and not stale:
+                return self.baselines[key]
+            since = frame["measurement_date"].max() - pd.Timedelta(days=window_days)
+            # 取得済みの期間で足りなければ全員分を取り直す
+            refetch = self.baseline_rows is None or since < self.baseline_since
+            if refetch:
+                filters = build_filters(date_from=since)
+            elif not stale:
+                self.baselines[key] = BaselineAlerts.build(self.baseline_rows, method, window_days)
+                return self.baselines[key]
+            else:
+                since = min(since, self.baseline_since)
+                names = select_rows(frame, stale)["name"].unique()
+                filters = build_filters(names=names, date_from=since)
+
+        try:
+            rows = self._fetch_baseline_rows(filters)
+        except httpx.TransportError as e:
+            logger.warning("%s/%s: failed to fetch baseline rows: %s", self.table_name, self.team, e)
+            with self._lock:
+                self.last_error = e
+                if key in self.baselines:
+                    return self.baselines[key]
+            return BaselineAlerts.build(pd.DataFrame(columns=SORT_COLS), method, window_days)
+
+        with self._lock:
+            if not refetch and self.baseline_rows is None:
+                # 取得中に読み込み直された：次の呼び出しで全員分を取り直す
+                return BaselineAlerts.build(rows, method, window_days)
+            # 取得中に届いた行で取り直し待ちになった選手は、次の呼び出しで取り直す
+            self._baseline_stale.difference_update(stale)
+            if refetch:
+                self.baseline_rows = rows
+                self.baseline_since = since
+                self.baselines = {}
+            else:
+                kept = self.baseline_rows[~self.baseline_rows["name_norm"].isin(stale)]
+                self.baseline_rows = sort_team_frame(merge_rows(kept, rows))
+                changed = pd.DataFrame({"name_norm": stale})
+                self.baselines = {k: b.update(self.baseline_rows, changed) for k, b in self.baselines.items()}
+            if key not in self.baselines:
+                self.baselines[key] = BaselineAlerts.build(self.baseline_rows, method, window_days)
+            return self.baselines[key]
+
+    def _fetch_baseline_rows(self, filters):
+        """filters で絞った行の指標列を sort_team_frame() の順で返す（繋がらないときは httpx.TransportError）"""
+        extras = [e for e in self._fetch_columns(BASELINE_SOURCE_COLS, filters=filters) if not e.empty]
+        rows = extras[0] if extras else pd.DataFrame(columns=UPSERT_KEY)
+        for extra in extras[1:]:
+            rows = rows.merge(extra, on=UPSERT_KEY, how="outer")
+        rows["measurement_date"] = pd.to_datetime(rows["measurement_date"], errors="coerce")
+        rows = rows.dropna(subset=["measurement_date"])
+        rows["name_norm"] = normalize_names(rows["name"])
+        return sort_team_frame(rows)
+
+
+# -----------------------------
+# キャッシュ
+# -----------------------------
+class TeamDataCache:
+    """(テーブル, チーム, クエリ形) をキーにした TTL 付きキャッシュ
+
+    Streamlit は操作のたびにスクリプト全体を再実行するため、
+    TTL 内の再実行はメモリから返し、Supabase へは問い合わせない。
+    TTL 切れのときは refresher があれば前回値からの差分更新、なければ loader で取り直す。
+    max_entries を超えたら、最も長く使われていないエントリから捨てる。
+    キャッシュした値（TeamTable の frame など）は全セッションで共有されるので、呼び出し側で変更しないこと。
+    """
+
+    def __init__(self, ttl_sec=DEFAULT_TTL_SEC, max_entries=DEFAULT_MAX_CACHE_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader, refresher=None):
+        """key が TTL 内にあれば返し、なければ loader() / refresher(前回値) の結果を保存して返す"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_sec:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            if entry is not None and refresher is not None:
+                self.refreshes += 1
+            else:
+                self.misses += 1
+
+        if entry is not None and refresher is not None:
+            value = refresher(entry[1])
+        else:
+            value = loader()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _matching_keys(self, table_name, team):
+        for key in list(self._entries):
+            if table_name is not None and key[0] != table_name:
+                continue
+            if team is not None and key[1] != team:
+                continue
+            yield key
+
+    def invalidate(self, table_name=None, team=None):
+        """テーブル / チームに一致するエントリを破棄する（省略時は全件）"""
+        with self._lock:
+            for key in self._matching_keys(table_name, team):
+                del self._entries[key]
+
+    def expire(self, table_name=None, team=None):
+        """値は残したまま TTL 切れ扱いにする（次回 get で差分更新させる）"""
+        with self._lock:
+            for key in self._matching_keys(table_name, team):
+                self._entries[key] = (float("-inf"), self._entries[key][1])
+
+    def age(self, key):
+        """key を取得してからの経過秒数（未取得なら None）"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] == float("-inf"):
+            return None
+        return time.monotonic() - entry[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "entries": len(self._entries),
+            }
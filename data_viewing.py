@@ -1,34 +1,242 @@
 import streamlit as st
 from supabase import create_client
 import pandas as pd
-import altair as alt
-import re
+import os
+import time
+
+from data_loader import (
+    DEFAULT_TTL_SEC,
+    DEFAULT_FETCH_WORKERS,
+    DEFAULT_MAX_CACHE_ENTRIES,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_SNAPSHOT_INTERVAL_SEC,
+    UPSERT_KEY,
+    TeamDataCache,
+    TeamTable,
+    build_filters,
+    fetch_reports,
+    join_columns,
+    remove_snapshot,
+    snapshot_path,
+)
+from baseline import DEFAULT_THRESHOLD, DEFAULT_WINDOW_DAYS, METHODS
+from charts import combined_chart, heatmap_chart, metric_chart, to_long, x_axis_format
+from downsample import DEFAULT_MAX_POINTS
+from heatmap import HeatmapMatrix
+from live import DEFAULT_BATCH_SEC, DEFAULT_POLL_SEC, LocalFeed, PollingFeed, RealtimeFeed
+from prefetch import DEFAULT_MAX_ENTRIES as DEFAULT_PREFETCH_ENTRIES, LRUCache, Prefetcher, neighbours
+from profiling import RerunProfiler
+from query import add_load_columns, build_metric_view, build_views, filter_period, metric_column, select_athletes
+from schema import NON_NUMERIC_COLS, TEXT_COLS, metric_dict
+from teams import load_team_registry, resolve_team
+from text_items import DEFAULT_TEXT_PAGE_SIZE, nonempty_text_rows, page_bounds
+from training_load import LOAD_METRICS
 
 # -----------------------------
-# 1) Supabase 接続
+# 0) 処理時間の計測（?profile=1 または secrets の PROFILE = true で有効）
+#   - 節ごとの処理時間をサイドバーの「処理時間の内訳」に表示
+#   - ?profile=dump または PROFILE_DUMP = true で、再実行ごとのスタックのサンプリング結果を
+#     PROFILE_DIR（既定 "profiles"）に collapsed 形式で保存（flamegraph.pl / speedscope で表示）
+# -----------------------------
+profile_param = st.query_params.get("profile", "")
+profile_dump = profile_param == "dump" or bool(st.secrets.get("PROFILE_DUMP", False))
+profiler = RerunProfiler(
+    enabled=bool(profile_param) or bool(st.secrets.get("PROFILE", False)) or profile_dump,
+    dump_dir=st.secrets.get("PROFILE_DIR", "profiles") if profile_dump else None,
+)
+
 # -----------------------------
+# 1) Supabase 接続（全チーム・全セッションで1つのクライアントを共有）
+# -----------------------------
+profiler.mark("1) 接続")
 supabase_url = st.secrets["SUPABASE_URL"]
 supabase_key = st.secrets["SUPABASE_KEY"]
-table_name   = st.secrets["SUPABASE_TABLE"]
-fixed_team   = st.secrets["FIXED_TEAM"]
 
-supabase = create_client(supabase_url, supabase_key)
+@st.cache_resource
+def get_supabase_client(url, key):
+    return create_client(url, key)
+
+supabase = get_supabase_client(supabase_url, supabase_key)
+
+# -----------------------------
+# 1.5) チーム選択
+#   - FIXED_TEAM があればそのチームに固定（チーム別デプロイ）
+#   - なければ secrets の TEAMS から選択（初期値は URL の ?team= → DEFAULT_TEAM → 先頭）
+# -----------------------------
+profiler.mark("1.5) チーム選択")
+teams = load_team_registry(st.secrets)
+requested_team = st.query_params.get("team")
+
+try:
+    team_cfg = resolve_team(teams, st.secrets, requested_team)
+except KeyError:
+    st.error(f"チーム '{requested_team}' は登録されていません。")
+    st.stop()
+
+if not st.secrets.get("FIXED_TEAM"):
+    if len(teams) == 0:
+        st.error("チームが設定されていません（secrets の FIXED_TEAM または TEAMS を設定してください）。")
+        st.stop()
+    team_keys = list(teams)
+    selected_team_key = st.sidebar.selectbox(
+        "チーム",
+        options=team_keys,
+        index=team_keys.index(team_cfg.key) if team_cfg is not None else 0,
+        format_func=lambda k: teams[k].label,
+    )
+    st.query_params["team"] = selected_team_key
+    team_cfg = teams[selected_team_key]
+
+table_name = team_cfg.table_name
+fixed_team = team_cfg.team
 
 # -----------------------------
-# 2) データ取得（チーム固定）
+# 2) データ取得（チームごと・TTL付きキャッシュ）
+#   - SYNC_MODE = "delta"（既定）：TTL切れ時は前回以降の追加・更新行だけ取得してマージ
+#   - SYNC_MODE = "full"        ：TTL切れ時は毎回全件取得
+#   - 取得は PAGE_SIZE 件ずつのページに分け、FETCH_WORKERS 本で並列取得
+#   - LAZY_COLUMNS = true（既定）：最初はキー列だけ取得し、指標・テキスト列は 8) で必要な分だけ追加取得
+#   - QUERY_MODE = "pushdown"  ：指標・テキスト列は選択中の選手・期間・年度だけをサーバ側で絞って取得
+#   - 取得結果は SNAPSHOT_DIR に Parquet で保存し、起動時はそこから表示してから裏でサーバと同期
+#     （空文字で無効。Supabase に繋がらないときもスナップショットで表示を続ける）
 # -----------------------------
+profiler.mark("2) 読み込み・正規化")
+@st.cache_resource
+def get_data_cache():
+    """全チーム・全セッション共通のキャッシュ（キーにチームを含む。TTLは CACHE_TTL_SEC、既定10分）"""
+    return TeamDataCache(ttl_sec=float(st.secrets.get("CACHE_TTL_SEC", DEFAULT_TTL_SEC)))
+
+@st.cache_resource
+def get_derived_cache():
+    """pushdown の絞り込み結果・ヒートマップの行列などのキャッシュ（TeamTable とは別の上限で捨てる）
+
+    キーには frame の版を含めるので、同期やライブ更新で行が変わると作り直す。
+    """
+    return TeamDataCache(
+        ttl_sec=float(st.secrets.get("CACHE_TTL_SEC", DEFAULT_TTL_SEC)),
+        max_entries=int(st.secrets.get("DERIVED_CACHE_ENTRIES", DEFAULT_MAX_CACHE_ENTRIES)),
+    )
+
+data_cache = get_data_cache()
+derived_cache = get_derived_cache()
+sync_mode = st.secrets.get("SYNC_MODE", "delta")
+query_mode = st.secrets.get("QUERY_MODE", "team")
+lazy_columns = query_mode == "pushdown" or bool(st.secrets.get("LAZY_COLUMNS", True))
+cache_key = (table_name, fixed_team, "lazy" if lazy_columns else "*")
+snapshot_dir = st.secrets.get("SNAPSHOT_DIR", "snapshots")
+snap_path = snapshot_path(snapshot_dir, *cache_key) if snapshot_dir else None
+fetch_opts = {
+    "page_size": int(st.secrets.get("PAGE_SIZE", DEFAULT_PAGE_SIZE)),
+    "max_workers": int(st.secrets.get("FETCH_WORKERS", DEFAULT_FETCH_WORKERS)),
+}
+
+if st.sidebar.button("今すぐ更新"):
+    data_cache.expire(table_name=table_name, team=fixed_team)
+    derived_cache.expire(table_name=table_name, team=fixed_team)
+if st.sidebar.button("全件再取得"):
+    data_cache.invalidate(table_name=table_name, team=fixed_team)
+    derived_cache.invalidate(table_name=table_name, team=fixed_team)
+    remove_snapshot(snap_path)
+
 def load_data():
-    result = (
-        supabase.table(table_name)
-        .select("*")
-        .eq("team", fixed_team)
-        .execute()
+    # 測定日変換・name 正規化（2.5）まで済ませた状態でキャッシュする
+    refresher = None
+    if sync_mode == "delta":
+        refresher = lambda table: table.sync()
+    return data_cache.get(
+        cache_key,
+        lambda: TeamTable(
+            supabase, table_name, fixed_team,
+            lazy_columns=lazy_columns, snapshot_path=snap_path,
+            snapshot_interval=float(st.secrets.get("SNAPSHOT_INTERVAL_SEC", DEFAULT_SNAPSHOT_INTERVAL_SEC)),
+            **fetch_opts
+        ).open(reconcile=sync_mode),
+        refresher=refresher,
+    )
+
+team_table = load_data()
+df_version, df = team_table.snapshot()
+
+cache_stats = data_cache.stats()
+cache_age = data_cache.age(cache_key) or 0
+st.sidebar.caption(
+    f"最終取得：{int(cache_age)}秒前 / キャッシュ ヒット {cache_stats['hits']}"
+    f"・差分 {cache_stats['refreshes']}・取得 {cache_stats['misses']}"
+)
+
+fetch_report = fetch_reports.get((table_name, fixed_team))
+if fetch_report is not None:
+    st.sidebar.caption(
+        f"全件取得：{fetch_report.rows} / {fetch_report.expected} 件"
+        f"（{fetch_report.pages}ページ・{fetch_report.seconds:.1f}秒）"
     )
-    return pd.DataFrame(result.data)
+    if fetch_report.rows != fetch_report.expected:
+        st.sidebar.warning("取得件数がサーバ側の件数と一致しません。「全件再取得」を試してください。")
+elif team_table.from_snapshot:
+    st.sidebar.caption("保存済みスナップショットから表示しています（裏でサーバと同期）。")
+
+if team_table.last_error is not None:
+    st.sidebar.warning("Supabaseに接続できないため、手元のデータで表示しています。")
 
-df = load_data()
+# -----------------------------
+# 2.1) ライブ更新（LIVE_MODE = "realtime" / "poll" / "local"、既定は無効）
+#   - 新しい行だけを受け取って team_table に足す（表の取り直しはしない）
+#     realtime：Supabase Realtime、poll：LIVE_POLL_SEC 秒ごとに updated_at が新しい行だけを問い合わせ、
+#     local：LIVE_LOCAL_PATH（JSON Lines）に追記された行（テスト用）
+#   - realtime は LIVE_BATCH_SEC 秒の間に届いた行をまとめて反映し、スナップショットは
+#     SNAPSHOT_INTERVAL_SEC 秒に1回まとめて保存する（1行ごとに全期間のマージ・保存をしない）
+#   - 行が届いて team_table.version が変わると、LIVE_REFRESH_SEC 秒以内にページを再実行する
+#     グラフ・サマリー（10-1）は選手ごとの版をキーに持つので、作り直すのは行が届いた選手の分だけ
+# -----------------------------
+live_mode = st.secrets.get("LIVE_MODE", "off")
+
+@st.cache_resource
+def get_live_feed(mode, table_name, team):
+    """(方式, テーブル, チーム) ごとに1つの受信スレッド（全セッション共通）"""
+    if mode == "realtime":
+        feed = RealtimeFeed(
+            supabase_url, supabase_key, table_name, team,
+            batch_sec=float(st.secrets.get("LIVE_BATCH_SEC", DEFAULT_BATCH_SEC)),
+        )
+    elif mode == "poll":
+        feed = PollingFeed(
+            supabase, table_name, team, interval=float(st.secrets.get("LIVE_POLL_SEC", DEFAULT_POLL_SEC))
+        )
+    else:
+        feed = LocalFeed(st.secrets.get("LIVE_LOCAL_PATH", os.path.join("live", f"{table_name}__{team}.jsonl")))
+    return feed.start()
+
+if live_mode in ("realtime", "poll", "local"):
+    # 「全件再取得」などで team_table が作り直されても、届いた行は今の team_table に入れる
+    live_feed = get_live_feed(live_mode, table_name, fixed_team).attach(team_table)
+    # 描画に使った frame の版（snapshot() のあとに届いた行も次の確認で拾う）
+    st.session_state["live_seen_version"] = df_version
+
+    @st.fragment(run_every=float(st.secrets.get("LIVE_REFRESH_SEC", 5)))
+    def live_status():
+        if live_feed.table.version != st.session_state.get("live_seen_version"):
+            st.rerun()
+        received = (
+            time.strftime("%H:%M:%S", time.localtime(live_feed.last_received)) if live_feed.last_received else "なし"
+        )
+        st.caption(f"ライブ更新（{live_mode}）：受信 {live_feed.received}件・最終受信 {received}")
+        if live_feed.last_error is not None:
+            st.warning("ライブ更新の受信でエラーが起きています（通常の同期は続けています）。")
+
+    with st.sidebar:
+        live_status()
+
+if team_table.coercion_failures:
+    with st.sidebar.expander("型変換できなかった値"):
+        st.dataframe(
+            pd.DataFrame(
+                list(team_table.coercion_failures.items()),
+                columns=["列", "件数"],
+            ),
+            use_container_width=True,
+        )
 
-st.title(f"{fixed_team} データ")
+st.title(f"{team_cfg.label} データ")
 
 if df.empty:
     st.warning("Supabaseからデータが取得できませんでした（0件）。")
@@ -36,117 +244,119 @@ if df.empty:
 
 # -----------------------------
 # 2.5) 測定日と name 正規化（スペース揺れ対策）
+#   - load_data() 内の prepare_frame() で実施済み（name_norm は Categorical）
+#   - df はキャッシュと共有しているので、以降は .copy() した frame だけを変更する
 # -----------------------------
-df["measurement_date"] = pd.to_datetime(df["measurement_date"], errors="coerce")
-df = df.dropna(subset=["measurement_date"])
-
-def normalize_name(x: str) -> str:
-    """前後空白除去 + 全角スペース→半角 + 連続空白→1つ"""
-    if pd.isna(x):
-        return ""
-    s = str(x).strip()
-    s = s.replace("\u3000", " ")
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-df["name_norm"] = df["name"].apply(normalize_name)
-
-# -----------------------------
-# 3) 指標名（日本語 ↔ Supabase列名）
-# -----------------------------
-metric_dict = {
-    "全般的な体調（mm）": "general_condition_mm",
-    "疲労感（mm）": "fatigue_mm",
-    "睡眠時間（h）": "sleep_hours",
-    "睡眠の深さ（mm）": "sleep_depth_mm",
-    "睡眠状況": "sleep_status",
-    "食欲（mm）": "appetite_mm",
-    "故障の程度（mm）": "injury_severity_mm",
-    "練習強度（mm）": "training_intensity_mm",
-    "便の形": "stool_form",
-    "走行距離（km）": "distance_km",
-    "SpO2（%）": "spo2",
-    "心拍数（bpm）": "heart_rate",
-    "体温（℃）": "body_temp",
-    "体重（kg）": "body_mass",
-    "特記事項": "notes",
-    "体重変化率（%）": "body_mass_change_pct",
-    "sRPE": "srpe",
-    "トレーニング時間（min）": "training_time_min",
-    "RPE": "rpe",
-    "d-ROMs": "d_roms",
-    "BAP": "bap",
-    "BAP/d-ROMs": "bap_droms_ratio",
-    "CK": "ck",
-    "TP": "tp",
-    "HF": "hf",
-    "LF": "lf",
-    "LF/HF": "lf_hf_ratio",
-    "ヘモグロビン濃度": "hb_conc",
-    "総ヘモグロビン量": "hbmass",
-    "総ヘモグロビン量/体重": "hbmass_per_kg",
-    "推定VO2max/体重": "vo2max_per_kg",
-    "蛋白": "pro",
-    "クレアチニン": "cre",
-    "pH": "ph",
-    "尿比重": "sg",
-    "その他": "another",
-    "備考": "remarks",
-}
 
 # -----------------------------
-# 4) 軸設定（項目ごと）
+# 2.6) チームアラート（個人ベースラインからの逸脱）
+#   - 選手ごとに最新の記録日の値を、その前 N 日間の本人の値と比べた z スコア（baseline.py）
+#   - 指標列が読み込み済みでなければ、チームの直近 N+1 日分の行の指標列だけをサーバ側で絞って取得する
+#     （frame には足さないので、遅延取得・pushdown の初回表示は軽いまま）。
+#     同期で行が変わったら、変わった選手の分だけを取り直して更新する（指標列付きで届いたライブ更新の行はそのまま使う）
+#   - 設定を変えたときはこの節（fragment）だけを再実行する
 # -----------------------------
-axis_config = {
-    "全般的な体調（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
-    "疲労感（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
-    "睡眠の深さ（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
-    "食欲（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
-    "故障の程度（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
-    "練習強度（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
-
-    "睡眠時間（h）": {"y_domain": (0, 12), "y_zero": True, "tick_step": 1},
-    "トレーニング時間（min）": {"y_domain": (0, 300), "y_zero": True, "tick_step": 30},
-    "走行距離（km）": {"y_domain": (0, 50), "y_zero": True, "tick_step": 5},
-
-    "SpO2（%）": {"y_domain": (88, 100), "y_zero": False, "tick_step": 1},
-    "心拍数（bpm）": {"y_domain": (30, 80), "y_zero": False, "tick_step": 5},
-    "体温（℃）": {"y_domain": (34, 40), "y_zero": False, "tick_step": 0.5},
-
-    "RPE": {"y_domain": (0, 10), "y_zero": True, "tick_step": 1},
-    "pH": {"y_domain": (4, 9), "y_zero": False, "tick_step": 1},
-    "尿比重": {"y_domain": (1.000, 1.040), "y_zero": False, "tick_step": 0.005},
-}
+profiler.mark("2.6) チームアラート")
+
+@st.fragment
+def team_alerts():
+    with st.expander("チームアラート（個人ベースラインからの逸脱）", expanded=True):
+        alert_cols = st.columns(3)
+        baseline_method = alert_cols[0].radio(
+            "ベースライン", options=list(METHODS), format_func=METHODS.get, horizontal=True, key="baseline_method"
+        )
+        baseline_days = int(alert_cols[1].number_input(
+            "直前の日数", min_value=7, max_value=365,
+            value=int(st.secrets.get("BASELINE_DAYS", DEFAULT_WINDOW_DAYS)), step=7, key="baseline_days"
+        ))
+        alert_z = float(alert_cols[2].number_input(
+            "|z| のしきい値", min_value=0.5, max_value=10.0,
+            value=float(st.secrets.get("ALERT_Z", DEFAULT_THRESHOLD)), step=0.5, key="alert_z"
+        ))
+
+        baselines = team_table.ensure_baselines(baseline_method, baseline_days)
+        alert_day = baselines.latest_day()
+        alerts = baselines.alerts(alert_z)
+        if alert_day is None:
+            st.info("ベースラインを計算できる数値データがありません。")
+        elif alerts.empty:
+            st.caption(f"{alert_day.strftime(x_axis_format)}：|z| ≥ {alert_z:g} の指標はありません。")
+        else:
+            st.caption(
+                f"{alert_day.strftime(x_axis_format)}：{alerts['name_norm'].nunique()}人・{len(alerts)}件"
+                f"（直前 {baseline_days} 日間の本人の値と比較）"
+            )
+            st.dataframe(
+                pd.DataFrame({
+                    "選手": alerts["name_norm"],
+                    "指標": alerts["metric_ja"],
+                    "値": alerts["value"].round(2),
+                    "ベースライン": alerts["center"].round(2),
+                    "ばらつき": alerts["scale"].round(2),
+                    "記録数": alerts["n"],
+                    "z": alerts["z"].round(2),
+                }),
+                use_container_width=True,
+                hide_index=True,
+            )
 
-x_axis_format = "%Y-%m-%d"
+if bool(st.secrets.get("TEAM_ALERTS", True)):
+    team_alerts()
 
 # -----------------------------
-# テキスト列
+# 3) 指標名（日本語 ↔ Supabase列名）・4) 軸設定・テキスト列
+#   - schema.py に定義（読み込み時の型もここから決まる。グラフの組み立ては charts.py）
 # -----------------------------
-INJURY_LOC_COL = "injury_location"  # 必要なら変更
-TEXT_COLS = [
-    ("睡眠状況", "sleep_status"),
-    ("故障の箇所", INJURY_LOC_COL),
-    ("特記事項", "notes"),
-    ("その他", "another"),
-    ("備考", "remarks"),
-]
 
 # -----------------------------
 # 5) 比較モード
 # -----------------------------
+profiler.mark("3〜5) 設定")
 MULTI_MODE = "複数選手比較（最大5人）"
 SAME_MODE  = "同一選手比較"
+TEAM_MODE  = "チーム全体（ヒートマップ）"
 
 compare_mode = st.radio(
     "比較方法を選択してください",
-    options=[MULTI_MODE, SAME_MODE],
+    options=[MULTI_MODE, SAME_MODE, TEAM_MODE],
     horizontal=True
 )
 
 # -----------------------------
 # 6) 選手選択（name_norm）
+#   - 抽出した frame（選手の行・期間の行）は (frame の版, 列, 選手, 期間) をキーに frame_memo に保持し、
+#     同じ選択に戻ったときや 8) 以降の節（fragment）の再実行では抽出し直さない
 # -----------------------------
+profiler.mark("6〜7) 選手選択・抽出")
+
+@st.cache_resource
+def get_frame_memo():
+    """抽出した frame のキャッシュ（全チーム・全セッション共通。値は変更しないこと）"""
+    return LRUCache(max_entries=int(st.secrets.get("FRAME_MEMO_ENTRIES", 16)))
+
+frame_memo = get_frame_memo()
+
+def frame_key(kind, frame, version, names, *spec):
+    return (cache_key, version, tuple(frame.columns), kind, tuple(names), *spec)
+
+def athletes_frame(frame, version, names):
+    # frame は（選手, 測定日）順に並んでいるので、二分探索で選手ごとの行のまとまりを切り出す
+    return frame_memo.get_or_build(
+        frame_key("athletes", frame, version, names),
+        lambda: select_athletes(frame, names),
+    )
+
+def period_frame(frame, version, names, fiscal_years, months, start, end):
+    return frame_memo.get_or_build(
+        frame_key(
+            "period", frame, version, names,
+            tuple(fiscal_years) if fiscal_years is not None else None,
+            tuple(months) if months is not None else None,
+            start, end,
+        ),
+        lambda: filter_period(athletes_frame(frame, version, names), names, start, end, fiscal_years, months),
+    )
+
 athletes = sorted(df["name_norm"].dropna().unique())
 athletes = [a for a in athletes if str(a).strip() != ""]
 
@@ -166,6 +376,8 @@ if compare_mode == MULTI_MODE:
     if len(selected_names_norm) > 5:
         st.error("選択は最大5人までです。")
         st.stop()
+elif compare_mode == TEAM_MODE:
+    selected_names_norm = athletes
 else:
     selected_name_norm = st.selectbox(
         "選手を選択してください（同一選手比較：1人）",
@@ -174,8 +386,7 @@ else:
     )
     selected_names_norm = [selected_name_norm]
 
-df_sel = df[df["name_norm"].isin(selected_names_norm)].copy()
-df_sel["name"] = df_sel["name_norm"]  # 表示用も統一
+df_sel = athletes_frame(df, df_version, selected_names_norm)
 
 # -----------------------------
 # 7) 抽出：期間 or 年度+月
@@ -185,16 +396,17 @@ if YEAR_COL not in df_sel.columns:
     st.error(f"必要な列 '{YEAR_COL}' が見つかりません。列名を確認してください。")
     st.stop()
 
-df_sel[YEAR_COL] = pd.to_numeric(df_sel[YEAR_COL], errors="coerce")
-
 mode = st.radio(
     "データの選び方",
     options=["期間で選ぶ", "年度＋月で選ぶ"],
     horizontal=True
 )
 
-df_period = None
 filter_label = ""
+selected_fiscal_years = None  # サーバ側絞り込み用（期間モードでは None）
+selected_months = None
+start_ts = end_ts = None  # 期間モードのときだけ
+years_all = months = []
 
 if mode == "年度＋月で選ぶ":
     years_all = sorted(df_sel[YEAR_COL].dropna().unique())
@@ -218,29 +430,6 @@ if mode == "年度＋月で選ぶ":
             st.error("年度の選択は最大5年までです。5年以内にしてください。")
             st.stop()
 
-        df_year = df_sel[df_sel[YEAR_COL].isin(selected_years)].copy()
-
-        df_year["month"] = df_year["measurement_date"].dt.month
-        months = sorted(df_year["month"].dropna().unique())
-        if len(months) == 0:
-            st.info("指定年度に測定日のある月がありません。")
-            st.stop()
-
-        selected_months = st.multiselect(
-            "月を選択してください（複数可 / 測定日が存在する月のみ）",
-            options=months,
-            default=[months[-1]]
-        )
-        if len(selected_months) == 0:
-            st.info("少なくとも1つ月を選択してください。")
-            st.stop()
-
-        df_period = df_year[df_year["month"].isin(selected_months)].copy()
-
-        years_str  = ", ".join(str(int(y)) for y in selected_years)
-        months_str = ", ".join(str(int(m)) for m in selected_months)
-        filter_label = f"年度：{years_str} / 月：{months_str}"
-
     # 複数選手比較：年度は単年（従来）
     else:
         selected_year = st.selectbox(
@@ -248,30 +437,31 @@ if mode == "年度＋月で選ぶ":
             options=years_all,
             index=len(years_all) - 1
         )
+        selected_years = [selected_year]
 
-        df_year = df_sel[df_sel[YEAR_COL] == selected_year].copy()
-        if df_year.empty:
-            st.info("指定年度のデータがありません。")
-            st.stop()
+    year_dates = df_sel.loc[df_sel[YEAR_COL].isin(selected_years), "measurement_date"]
+    if year_dates.empty:
+        st.info("指定年度のデータがありません。")
+        st.stop()
 
-        df_year["month"] = df_year["measurement_date"].dt.month
-        months = sorted(df_year["month"].dropna().unique())
-        if len(months) == 0:
-            st.info("指定年度に測定日のある月がありません。")
-            st.stop()
+    months = sorted(year_dates.dt.month.dropna().unique())
+    if len(months) == 0:
+        st.info("指定年度に測定日のある月がありません。")
+        st.stop()
 
-        selected_months = st.multiselect(
-            "月を選択してください（複数可 / 測定日が存在する月のみ）",
-            options=months,
-            default=[months[-1]]
-        )
-        if len(selected_months) == 0:
-            st.info("少なくとも1つ月を選択してください。")
-            st.stop()
+    selected_months = st.multiselect(
+        "月を選択してください（複数可 / 測定日が存在する月のみ）",
+        options=months,
+        default=[months[-1]]
+    )
+    if len(selected_months) == 0:
+        st.info("少なくとも1つ月を選択してください。")
+        st.stop()
 
-        df_period = df_year[df_year["month"].isin(selected_months)].copy()
-        months_str = ", ".join(str(int(m)) for m in selected_months)
-        filter_label = f"年度：{int(selected_year)} / 月：{months_str}"
+    selected_fiscal_years = selected_years
+    years_str  = ", ".join(str(int(y)) for y in selected_years)
+    months_str = ", ".join(str(int(m)) for m in selected_months)
+    filter_label = f"年度：{years_str} / 月：{months_str}"
 
 else:
     available_dates = sorted(df_sel["measurement_date"].dt.date.unique())
@@ -288,220 +478,371 @@ else:
 
     start_ts = pd.Timestamp(start_date)
     end_ts   = pd.Timestamp(end_date)
-
-    mask = (
-        (df_sel["measurement_date"] >= start_ts) &
-        (df_sel["measurement_date"] <= end_ts)
-    )
-    df_period = df_sel.loc[mask].copy()
     filter_label = f"期間：{start_date} 〜 {end_date}"
 
-if df_period is None or df_period.empty:
+# 8) 以降の節に渡す選択（fragment の再実行でも同じ値が渡る）
+selection = dict(
+    names=selected_names_norm, fiscal_years=selected_fiscal_years, months=selected_months,
+    start=start_ts, end=end_ts,
+)
+df_period = period_frame(df, df_version, **selection)
+if df_period.empty:
     st.info("指定条件のデータがありません。")
     st.stop()
 
-# -----------------------------
-# 8) 指標選択（最大5項目） ※文字列系は選ばせない
-# -----------------------------
-non_numeric_cols = {"sleep_status", "notes", "another", "remarks", "stool_form", INJURY_LOC_COL}
-metric_options = [k for k, v in metric_dict.items() if v not in non_numeric_cols]
-
-selected_metrics_ja = st.multiselect(
-    "表示する指標を選択してください（最大5項目）",
-    options=metric_options,
-    default=[metric_options[0]] if len(metric_options) > 0 else []
-)
-if len(selected_metrics_ja) == 0:
-    st.info("少なくとも1項目選択してください。")
-    st.stop()
-if len(selected_metrics_ja) > 5:
-    st.error("指標の選択は最大5項目までです。5項目以内にしてください。")
-    st.stop()
+overlay = compare_mode == SAME_MODE and mode == "年度＋月で選ぶ"
+
+def period_with_columns(cols, names, fiscal_years, months, start, end):
+    """抽出した行に cols を付けた frame（浅いコピー）を返す
+
+    pushdown は選択中の行（元の name・測定日）だけをサーバ側で絞って取得し、(条件, frame の版) ごとにキャッシュ。
+    それ以外は初回だけ team_table に列を追加取得する（列が増えると frame_memo のキーも変わる）。
+    """
+    if query_mode != "pushdown":
+        team_table.ensure_columns(cols)
+    version, frame = team_table.snapshot()
+    rows = period_frame(frame, version, names, fiscal_years, months, start, end).copy(deep=False)
+    if query_mode == "pushdown" and cols:
+        period_keys = frame.loc[rows.index, UPSERT_KEY]
+        filters = build_filters(
+            names=period_keys["name"].unique(),
+            date_from=period_keys["measurement_date"].min(),
+            date_to=period_keys["measurement_date"].max(),
+            fiscal_years=fiscal_years,
+        )
+        cols_key = tuple(sorted(set(cols)))
+        period_extra = derived_cache.get(
+            (table_name, fixed_team, ("filter", version, filters, cols_key)),
+            lambda: team_table.fetch_filtered(list(cols_key), filters),
+        )
+        period_joined = join_columns(period_keys, period_extra)
+        for c in period_joined.columns.difference(period_keys.columns):
+            rows[c] = period_joined[c]
+    return rows
 
 # -----------------------------
 # 9) 見出し
 # -----------------------------
-st.subheader(f"選手：{', '.join(selected_names_norm)} / {filter_label}")
+if compare_mode == TEAM_MODE:
+    st.subheader(f"チーム全体（{len(selected_names_norm)}人） / {filter_label}")
+else:
+    st.subheader(f"選手：{', '.join(selected_names_norm)} / {filter_label}")
 
 # -----------------------------
+# 8〜10) 指標選択・グラフ（fragment：指標や表示の切り替えではこの節だけを再実行し、1〜7 はやり直さない）
+# -----------------------------
+# 8) 指標選択（最大5項目） ※文字列系は選ばせない
+#   - 選んだ指標の列は初回だけ追加取得（pushdown は選択中の行の分だけ）
+# 9.5) チーム全体のヒートマップ（TEAM_MODE のときは 10 の代わりにこれを表示）
+#   - 指標ごとに 選手 × 測定日 の行列（heatmap.py）を作り、1つの rect グラフで描く
+#   - 行列は (指標, 期間, frame の版) ごとに derived_cache に保持（同期で frame が変われば作り直す）
 # 10) 指標ごとにグラフ
 #   - 同一選手比較 × 年度+月：年度-月で色分け、overlay_dateで重ね描き
+#   - 年度+月のサマリー表は月単位の集計（team_table.rollup）から作る
+#     （期間モードは月の途中で切れるので、これまでどおり抽出した行から集計）
+#   - 長期間の折れ線は系列ごとに CHART_MAX_POINTS 点まで LTTB で間引いて描く（0で無効）
+#     サマリー表は間引く前の全データから作る
+#   - 「まとめて」表示は全指標を縦持ちにして1つのグラフに（データは1回だけ送り、x軸のズームは連動）
+#   - TEAM_MODE では 9.5) のヒートマップを表示するので作らない
 # -----------------------------
-for metric_ja in selected_metrics_ja:
-    col = metric_dict[metric_ja]
-    if col not in df_period.columns:
-        st.warning(f"'{metric_ja}' の列 '{col}' がデータにないため表示できません。")
-        continue
-
-    df_period[col] = pd.to_numeric(df_period[col], errors="coerce")
-
-    use_cols = ["measurement_date", "name", YEAR_COL, col]
-    use_cols = [c for c in use_cols if c in df_period.columns]
-
-    plot_df = (
-        df_period.loc[:, use_cols]
-        .dropna(subset=["measurement_date", col])
-        .sort_values(["measurement_date"])
-        .copy()
+SEPARATE_LAYOUT = "指標ごと"
+COMBINED_LAYOUT = "まとめて（x軸連動）"
+
+metric_options = [k for k, v in metric_dict.items() if v not in NON_NUMERIC_COLS]
+# 負荷指標（sRPE・走行距離の急性/慢性負荷・ACWR・モノトニー・ストレイン）も同じように選べる
+metric_options += list(LOAD_METRICS)
+
+chart_max_points = int(st.secrets.get("CHART_MAX_POINTS", DEFAULT_MAX_POINTS))
+
+@st.cache_resource
+def get_prefetcher():
+    """全チーム・全セッション共通の先読みキャッシュ（キーにチームと frame の版を含む）"""
+    return Prefetcher(max_entries=int(st.secrets.get("PREFETCH_MAX_ENTRIES", DEFAULT_PREFETCH_ENTRIES)))
+
+prefetcher = get_prefetcher()
+# 結果のキャッシュと先読みは手元の frame から計算するので、サーバ側で絞り込む pushdown では使わない
+use_view_cache = query_mode != "pushdown" and compare_mode != TEAM_MODE
+use_prefetch = use_view_cache and bool(st.secrets.get("PREFETCH", True))
+
+def show_downsample_note(n_chart, n_plot):
+    if n_chart < n_plot:
+        st.caption(f"表示点数を間引いています（{n_plot}点 → {n_chart}点）。サマリー表は全データから集計しています。")
+
+@st.fragment
+def metric_panel(selection, filter_label, prefetch_candidates):
+    # 8) 指標選択
+    selected_metrics_ja = st.multiselect(
+        "表示する指標を選択してください（最大5項目）",
+        options=metric_options,
+        default=[metric_options[0]] if len(metric_options) > 0 else []
     )
-
-    if plot_df.empty:
-        st.info(f"{metric_ja} は指定条件のデータがありません。")
-        continue
-
-    cfg = axis_config.get(metric_ja, {"y_domain": None, "y_zero": False, "tick_step": None})
-    y_domain  = cfg.get("y_domain", None)
-    y_zero    = cfg.get("y_zero", False)
-    tick_step = cfg.get("tick_step", None)
-
-    y_scale = alt.Scale(domain=y_domain, zero=y_zero) if y_domain else alt.Scale(zero=y_zero)
-
-    y_axis = alt.Axis()
-    if y_domain and tick_step:
-        y_min, y_max = y_domain
-        ticks = []
-        v = y_min
-        while v <= y_max + 1e-9:
-            ticks.append(round(v, 6))
-            v += tick_step
-        y_axis = alt.Axis(values=ticks)
-
-    st.markdown(f"### {metric_ja}")
-
-    if compare_mode == SAME_MODE and mode == "年度＋月で選ぶ":
-        plot_df[YEAR_COL] = pd.to_numeric(plot_df[YEAR_COL], errors="coerce").astype("Int64")
-        plot_df["month"] = pd.to_datetime(plot_df["measurement_date"], errors="coerce").dt.month.astype("Int64")
-        plot_df["year_month_label"] = plot_df[YEAR_COL].astype(str) + "-" + plot_df["month"].astype(str)
-
-        plot_df["overlay_date"] = pd.to_datetime(
-            "2000-" + plot_df["measurement_date"].dt.strftime("%m-%d"),
-            errors="coerce"
-        )
-        plot_df = plot_df.dropna(subset=["overlay_date", "year_month_label"])
-        plot_df["group_key"] = plot_df["year_month_label"]
-
-        chart = (
-            alt.Chart(plot_df)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("overlay_date:T", title="月日", axis=alt.Axis(format="%m-%d")),
-                y=alt.Y(f"{col}:Q", title=metric_ja, scale=y_scale, axis=y_axis),
-                color=alt.Color("year_month_label:N", title="年度-月"),
-                detail=alt.Detail("group_key:N"),
-                tooltip=[
-                    alt.Tooltip("year_month_label:N", title="年度-月"),
-                    alt.Tooltip("measurement_date:T", title="測定日", format=x_axis_format),
-                    alt.Tooltip(f"{col}:Q", title=metric_ja),
-                ],
+    if len(selected_metrics_ja) == 0:
+        st.info("少なくとも1項目選択してください。")
+        return
+    if len(selected_metrics_ja) > 5:
+        st.error("指標の選択は最大5項目までです。5項目以内にしてください。")
+        return
+
+    df_period = period_with_columns(
+        [metric_dict[m] for m in selected_metrics_ja if m in metric_dict], **selection
+    )
+    # 負荷指標はチーム全期間で計算した表（team_table.training_load）から、抽出した行の分だけ引く
+    if any(m in LOAD_METRICS for m in selected_metrics_ja):
+        df_period = add_load_columns(df_period, selected_metrics_ja, team_table.ensure_training_load())
+
+    # 9.5) チーム全体のヒートマップ
+    if compare_mode == TEAM_MODE:
+        for metric_ja in selected_metrics_ja:
+            st.markdown(f"### {metric_ja}")
+            col = metric_column(metric_ja)
+            if col not in df_period.columns:
+                st.warning(f"列 '{col}' が見つかりません。")
+                continue
+            matrix = derived_cache.get(
+                (table_name, fixed_team, ("heatmap", team_table.version, col, filter_label)),
+                lambda: HeatmapMatrix.build(df_period, col),
             )
-            .properties(height=300)
-            .interactive()
-        )
-        st.altair_chart(chart, use_container_width=True)
-
-        summary = (
-            plot_df.groupby("year_month_label")[col]
-            .agg(["count", "mean", "min", "max"])
-            .reset_index()
-            .rename(columns={
-                "year_month_label": "年度-月",
-                "count": "測定回数",
-                "mean": "平均値",
-                "min": "最小値",
-                "max": "最大値",
-            })
-            .sort_values("年度-月")
+            if matrix.empty:
+                st.info("この期間は数値データがありません。")
+                continue
+            st.altair_chart(heatmap_chart(matrix.to_long(), matrix.names, metric_ja), use_container_width=True)
+        return
+
+    # 10) グラフ・サマリー
+    chart_layout = st.radio(
+        "グラフの表示",
+        options=[SEPARATE_LAYOUT, COMBINED_LAYOUT],
+        horizontal=True
+    )
+    team_rollup = team_table.rollup if mode == "年度＋月で選ぶ" else None
+
+    # 10-1) 指標ごとにグラフ用データとサマリー表を作る（表示は 10-2 でまとめて）
+    #   - 先読み（10-3）済みの条件ならその結果を使い、計算したものは次に戻ってきたとき用に入れておく
+    #   - キーは選んだ選手ごとの版なので、ライブ更新や同期で他の選手の行が変わっても作り直さない
+    def view_key(names, fiscal_years, months, start, end):
+        return (
+            cache_key, team_table.data_version(names), tuple(names),
+            tuple(fiscal_years) if fiscal_years is not None else None,
+            tuple(months) if months is not None else None,
+            start, end, tuple(selected_metrics_ja), overlay, chart_max_points,
         )
-        for c in ["平均値", "最小値", "最大値"]:
-            summary[c] = summary[c].round(2)
-        st.dataframe(summary, use_container_width=True)
 
-    else:
-        chart = (
-            alt.Chart(plot_df)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("measurement_date:T", title="測定日", axis=alt.Axis(format=x_axis_format)),
-                y=alt.Y(f"{col}:Q", title=metric_ja, scale=y_scale, axis=y_axis),
-                color=alt.Color("name:N", title="選手"),
-                tooltip=[
-                    alt.Tooltip("name:N", title="選手"),
-                    alt.Tooltip("measurement_date:T", title="測定日", format=x_axis_format),
-                    alt.Tooltip(f"{col}:Q", title=metric_ja),
-                ],
+    current_view_key = view_key(**selection)
+    metric_views = prefetcher.get(current_view_key) if use_view_cache else None
+    if metric_views is None:
+        metric_views = [
+            build_metric_view(
+                df_period, metric_ja, overlay, team_rollup,
+                selection["names"], selection["fiscal_years"], selection["months"], chart_max_points,
             )
-            .properties(height=300)
-            .interactive()
-        )
-        st.altair_chart(chart, use_container_width=True)
-
-        summary = (
-            plot_df.groupby("name")[col]
-            .agg(["count", "mean", "min", "max"])
-            .reset_index()
-            .rename(columns={
-                "name": "選手",
-                "count": "測定回数",
-                "mean": "平均値",
-                "min": "最小値",
-                "max": "最大値",
-            })
+            for metric_ja in selected_metrics_ja
+        ]
+        if use_view_cache:
+            prefetcher.put(current_view_key, metric_views)
+
+    # 10-2) 表示
+    charted = [v for v in metric_views if "chart_df" in v]
+    if chart_layout == COMBINED_LAYOUT and charted:
+        long_df = to_long([(v["metric_ja"], v["col"], v["chart_df"]) for v in charted], overlay=overlay)
+        st.altair_chart(
+            combined_chart(long_df, [v["metric_ja"] for v in charted], overlay=overlay),
+            use_container_width=True
         )
-        for c in ["平均値", "最小値", "最大値"]:
-            summary[c] = summary[c].round(2)
-        st.dataframe(summary, use_container_width=True)
+        show_downsample_note(len(long_df), sum(v["n_plot"] for v in charted))
+
+    for view in metric_views:
+        if "warning" in view:
+            st.warning(view["warning"])
+            continue
+        if "info" in view:
+            st.info(view["info"])
+            continue
+
+        st.markdown(f"### {view['metric_ja']}")
+        if chart_layout == SEPARATE_LAYOUT:
+            st.altair_chart(
+                metric_chart(view["chart_df"], view["col"], view["metric_ja"], overlay=overlay),
+                use_container_width=True
+            )
+            show_downsample_note(len(view["chart_df"]), view["n_plot"])
+        st.dataframe(view["summary"], use_container_width=True)
+
+    # 10-3) 次の選択の先読み（表示を終えてから裏のスレッドで計算。候補は下の prefetch_candidates）
+    if use_prefetch:
+        frame_now, rollup_now = team_table.frame, team_table.rollup
+        load_now = team_table.training_load if any(m in LOAD_METRICS for m in selected_metrics_ja) else None
+        metrics_now = list(selected_metrics_ja)
+
+        def prefetch_job(names, fiscal_years, months, start, end):
+            return lambda: build_views(
+                frame_now, names, metrics_now, start, end, fiscal_years, months,
+                rollup_now, overlay, chart_max_points, load_now,
+            )[1]
+
+        prefetcher.prefetch([(view_key(*c), prefetch_job(*c)) for c in prefetch_candidates])
 
 # -----------------------------
-# 11) テキスト項目（自動表示）
+# 10-3) 次の選択の先読みの候補（計算は指標を選んだあと metric_panel の最後に行う）
+#   - 年度＋月：前後の月（月を1つ選んでいるとき）・前後の年度（年度を1つ選んでいるとき）
+#   - 選手を1人選んでいるとき：選手一覧で前後の選手
+#   - 切り替えたあとの年度・月・期間は、画面の widget が取る値に合わせる
+#     （key のない widget は選択肢が変わると既定値＝最後の年度・最後の月・最初〜最後の測定日に戻る）
+#   - 結果は 10-1 と同じキーで prefetcher（上限 PREFETCH_MAX_ENTRIES 件）に入る
 # -----------------------------
-st.markdown("## テキスト項目")
+profiler.mark("8〜10) 指標選択・グラフ")
+
+def widget_value(options, current_options, current, default):
+    """選択肢が今と同じなら今の選択のまま、変わると既定値"""
+    return current if list(options) == list(current_options) else default
+
+def year_months(rows, years):
+    return sorted(rows.loc[rows[YEAR_COL].isin(years), "measurement_date"].dt.month.dropna().unique())
+
+def athlete_candidate(name):
+    rows = athletes_frame(df, df_version, [name])
+    if mode == "年度＋月で選ぶ":
+        years_a = [y for y in sorted(rows[YEAR_COL].dropna().unique()) if y >= 2016]
+        if not years_a:
+            return None
+        years = widget_value(years_a, years_all, selected_fiscal_years, [years_a[-1]])
+        months_a = year_months(rows, years)
+        if not months_a:
+            return None
+        return ([name], years, widget_value(months_a, months, selected_months, [months_a[-1]]), None, None)
+    dates_a = sorted(rows["measurement_date"].dt.date.unique())
+    if not dates_a:
+        return None
+    start, end = widget_value(dates_a, available_dates, (start_date, end_date), (dates_a[0], dates_a[-1]))
+    if start > end:
+        return None
+    return ([name], None, None, pd.Timestamp(start), pd.Timestamp(end))
+
+prefetch_candidates = []
+if use_prefetch:
+    if mode == "年度＋月で選ぶ":
+        if len(selected_months) == 1:
+            prefetch_candidates += [(selected_names_norm, selected_fiscal_years, [m], None, None) for m in neighbours(months, selected_months[0])]
+        if len(selected_fiscal_years) == 1:
+            for y in neighbours(years_all, selected_fiscal_years[0]):
+                months_y = year_months(df_sel, [y])
+                if months_y:
+                    prefetch_candidates.append(
+                        (selected_names_norm, [y], widget_value(months_y, months, selected_months, [months_y[-1]]), None, None)
+                    )
+    if len(selected_names_norm) == 1:
+        prefetch_candidates += [
+            c for c in map(athlete_candidate, neighbours(athletes, selected_names_norm[0])) if c is not None
+        ]
+
+metric_panel(selection, filter_label, prefetch_candidates)
 
-text_cols_exist = [(ja, col) for (ja, col) in TEXT_COLS if col in df_period.columns]
+# -----------------------------
+# 11) テキスト項目（自動表示・fragment：ページ送りではこの節だけを再実行）
+#   - 入力のある行だけを新しい順に TEXT_PAGE_SIZE 件ずつ表示（表示するページの分だけ表を作る）
+# -----------------------------
+profiler.mark("11) テキスト項目")
+text_page_size = int(st.secrets.get("TEXT_PAGE_SIZE", DEFAULT_TEXT_PAGE_SIZE))
 
-if len(text_cols_exist) == 0:
-    st.info("テキスト項目の列が見つかりません。")
-else:
-    text_base_cols = ["measurement_date", "name"]
-    if compare_mode == SAME_MODE and mode == "年度＋月で選ぶ":
-        df_period["_fy"] = pd.to_numeric(df_period[YEAR_COL], errors="coerce").astype("Int64")
-        df_period["_m"] = pd.to_datetime(df_period["measurement_date"], errors="coerce").dt.month.astype("Int64")
-        df_period["_year_month_label"] = df_period["_fy"].astype(str) + "-" + df_period["_m"].astype(str)
-        text_base_cols = ["measurement_date", "_year_month_label", "name"]
+@st.fragment
+def text_items(selection):
+    st.markdown("## テキスト項目")
 
-    show_cols = text_base_cols + [col for (_, col) in text_cols_exist]
-    show_cols = [c for c in show_cols if c in df_period.columns]
+    df_period = period_with_columns([col for (_, col) in TEXT_COLS], **selection)
+    text_cols_exist = [(ja, col) for (ja, col) in TEXT_COLS if col in df_period.columns]
 
-    text_df = df_period.loc[:, show_cols].copy()
-    text_df["measurement_date"] = pd.to_datetime(text_df["measurement_date"], errors="coerce").dt.strftime(x_axis_format)
+    if len(text_cols_exist) == 0:
+        st.info("テキスト項目の列が見つかりません。")
+        return
 
-    for _, col in text_cols_exist:
-        if col in text_df.columns:
-            text_df[col] = text_df[col].astype(str).str.strip()
-            text_df.loc[text_df[col].isin(["nan", "None", "NaT"]), col] = ""
+    texts = nonempty_text_rows(df_period, [col for (_, col) in text_cols_exist])
+    if texts.empty:
+        st.info("指定条件の範囲で、テキスト入力があるデータはありません。")
+        return
 
-    rename_map = {col: ja for (ja, col) in text_cols_exist}
-    text_df = text_df.rename(columns=rename_map)
+    n_pages = -(-len(texts) // text_page_size)
+    page = 1
+    if n_pages > 1:
+        page = int(st.number_input("ページ（新しい順）", min_value=1, max_value=n_pages, value=1, step=1, key="text_page"))
+    start, end = page_bounds(len(texts), page, text_page_size)
+    page_texts = texts.iloc[start:end]
 
-    if "_year_month_label" in text_df.columns:
-        text_df = text_df.rename(columns={"_year_month_label": "年度-月"})
+    rows = df_period.loc[page_texts.index]
+    text_df = pd.DataFrame({"measurement_date": rows["measurement_date"].dt.strftime(x_axis_format)})
+    if overlay:
+        text_df["年度-月"] = rows[YEAR_COL].astype(str) + "-" + rows["measurement_date"].dt.month.astype(str)
+    text_df["name"] = rows["name"]
+    text_df = text_df.join(page_texts.rename(columns={col: ja for (ja, col) in text_cols_exist}))
 
-    sort_cols = ["name", "measurement_date"]
-    if "年度-月" in text_df.columns:
-        sort_cols = ["年度-月"] + sort_cols
-    text_df = text_df.sort_values(sort_cols)
+    st.caption(f"{len(texts)}件中 {start + 1}〜{end}件目")
+    st.dataframe(text_df, use_container_width=True)
 
-    text_only_cols = [ja for (ja, col) in text_cols_exist if ja in text_df.columns]
-    if len(text_only_cols) > 0:
-        text_df = text_df[~(text_df[text_only_cols].apply(lambda r: all(str(x).strip() == "" for x in r), axis=1))]
+text_items(selection)
 
-    if text_df.empty:
-        st.info("指定条件の範囲で、テキスト入力があるデータはありません。")
-    else:
-        st.dataframe(text_df, use_container_width=True)
+# -----------------------------
+# 12) テキスト検索（チームの全期間が対象・fragment：検索語やページを変えてもこの節だけを再実行）
+#   - 文字 n-gram の転置インデックス（team_table.text_index）で引く
+#   - 初回の検索でテキスト列をチーム全件分取得してインデックスを作り、以降は同期のたびに差分で更新
+# -----------------------------
+profiler.mark("12) テキスト検索")
 
+@st.fragment
+def text_search():
+    st.markdown("## テキスト検索")
 
+    search_query = st.text_input("キーワード（特記事項・その他・備考・故障の箇所・睡眠状況から探します）", placeholder="例：発熱、膝")
+    if not search_query.strip():
+        return
 
+    text_index = team_table.ensure_text_index([col for (_, col) in TEXT_COLS])
+    hits = text_index.search(search_query)
 
+    if hits.empty:
+        st.info(f"「{search_query.strip()}」を含むテキストはありません。")
+        return
 
+    n_pages = -(-len(hits) // text_page_size)
+    page = 1
+    if n_pages > 1:
+        page = int(st.number_input("ページ（新しい順）", min_value=1, max_value=n_pages, value=1, step=1, key="search_page"))
+    start, end = page_bounds(len(hits), page, text_page_size)
 
+    hit_df = hits.iloc[start:end].rename(columns={"name_norm": "name"})
+    hit_df["measurement_date"] = hit_df["measurement_date"].dt.strftime(x_axis_format)
+    hit_df = hit_df[["measurement_date", "name"] + text_index.cols]
+    hit_df = hit_df.rename(columns={col: ja for (ja, col) in TEXT_COLS})
 
+    st.caption(f"{len(hits)}件中 {start + 1}〜{end}件目")
+    st.dataframe(hit_df, use_container_width=True, hide_index=True)
+
+text_search()
+
+# -----------------------------
+# 13) 先読みの状況（先読みは 10-3）
+# -----------------------------
+if use_prefetch:
+    prefetch_stats = prefetcher.stats()
+    st.sidebar.caption(
+        f"先読み：ヒット {prefetch_stats['hits']}・計算済み {prefetch_stats['prefetched']}"
+        f"（保持 {prefetch_stats['entries']}件）"
+    )
+
+# -----------------------------
+# 14) 処理時間の内訳（計測が有効なときだけ）
+#   - fragment だけの再実行は含まない（ページ全体を再実行したときの内訳）
+# -----------------------------
+stage_seconds = profiler.finish()
+if stage_seconds:
+    total_sec = sum(sec for _, sec in stage_seconds)
+    with st.sidebar.expander("処理時間の内訳", expanded=True):
+        st.dataframe(
+            pd.DataFrame({
+                "節": [label for label, _ in stage_seconds],
+                "ミリ秒": [round(sec * 1000, 1) for _, sec in stage_seconds],
+                "割合（%）": [round(sec / total_sec * 100, 1) if total_sec else 0.0 for _, sec in stage_seconds],
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.caption(f"合計 {total_sec * 1000:.0f} ミリ秒（サーバ側のスクリプト実行時間。ブラウザでの描画は含まない）")
+        if profiler.dump_path:
+            st.caption(f"サンプリング結果：{profiler.dump_path}")
@@ -0,0 +1,54 @@
+"""折れ線グラフ用の間引き（Largest-Triangle-Three-Buckets）"""
+import numpy as np
+
+DEFAULT_MAX_POINTS = 400
+
+
+def lttb_indices(x, y, n_out):
+    """LTTB で残す点の位置を返す（x は昇順。先頭と末尾は必ず残す）
+
+    点を n_out - 2 個のバケツに分け、各バケツから「前に選んだ点・次のバケツの平均点」と
+    作る三角形の面積が最大になる点を1つ選ぶ。形の特徴（山・谷）を保ったまま点数を減らせる。
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(df, x_col, y_col, group_col, max_points=DEFAULT_MAX_POINTS):
+    """group_col ごとに max_points 点まで LTTB で間引く（max_points が 0 以下なら何もしない）
+
+    df は x_col 昇順で、y_col に欠損がないこと（グラフ用に dropna / sort_values 済みの frame）。
+    """
+    if max_points <= 0 or len(df) <= max_points:
+        return df
+
+    xs = df[x_col].to_numpy().astype("datetime64[ns]").astype("int64").astype("float64")
+    ys = df[y_col].to_numpy().astype("float64")
+    positions = []
+    for group in df.groupby(group_col, observed=True, sort=False).indices.values():
+        if len(group) <= max_points:
+            positions.append(group)
+        else:
+            positions.append(group[lttb_indices(xs[group], ys[group], max_points)])
+
+    return df.iloc[np.sort(np.concatenate(positions))]
@@ -0,0 +1,51 @@
+"""チーム全体のヒートマップ用の 選手 × 測定日 の行列"""
+import numpy as np
+import pandas as pd
+
+
+class HeatmapMatrix:
+    """1指標を 選手 × 測定日 に並べた密な行列（記録のないマスは NaN）
+
+    names は行（選手）、days は列（期間内に記録のある日）。
+    同じ選手・同じ日の行が複数あるときは平均する。
+    """
+
+    def __init__(self, names, days, values):
+        self.names = names
+        self.days = days
+        self.values = values
+
+    @classmethod
+    def build(cls, rows, col):
+        """rows（抽出した行）の col から行列を作る"""
+        # name_norm は Categorical（読み込み時に正規化済み）なので、そのコードを行番号に使う
+        athletes = rows["name_norm"].cat.remove_unused_categories().array
+        days = rows["measurement_date"].dt.normalize()
+        day_index = pd.DatetimeIndex(days.dropna().unique()).sort_values()
+
+        values = rows[col].astype("float64").to_numpy()
+        row_codes = athletes.codes
+        col_codes = day_index.get_indexer(days)
+        ok = (row_codes >= 0) & (col_codes >= 0) & ~np.isnan(values)
+
+        # 選手コード × 日の位置 を1次元の番号にして、合計と件数を一度に数える
+        n_rows, n_cols = len(athletes.categories), len(day_index)
+        cells = row_codes[ok].astype("int64") * n_cols + col_codes[ok]
+        sums = np.bincount(cells, weights=values[ok], minlength=n_rows * n_cols)
+        counts = np.bincount(cells, minlength=n_rows * n_cols)
+        with np.errstate(invalid="ignore"):
+            matrix = (sums / counts).reshape(n_rows, n_cols)
+        return cls(list(athletes.categories), day_index, matrix)
+
+    @property
+    def empty(self):
+        return not np.isfinite(self.values).any()
+
+    def to_long(self):
+        """値のあるマスだけを (name, measurement_date, value) の縦持ちにする（グラフ用）"""
+        rows, cols = np.nonzero(np.isfinite(self.values))
+        return pd.DataFrame({
+            "name": np.asarray(self.names, dtype=object)[rows],
+            "measurement_date": self.days[cols],
+            "value": self.values[rows, cols],
+        })
@@ -0,0 +1,221 @@
+"""新しい測定値のライブ反映（表を取り直さずに、届いた行だけを手元の frame に足す）
+
+  - RealtimeFeed ：Supabase Realtime（postgres_changes）で INSERT / UPDATE を受け取る
+  - PollingFeed  ：updated_at が前回より新しい行だけを一定間隔で問い合わせる
+  - LocalFeed    ：テスト用。push() した行、または JSON Lines のファイルに追記された行を届ける
+どれも受け取った行を TeamTable.apply_rows() に渡す。削除（DELETE）は反映しない（「全件再取得」を使う）。
+RealtimeFeed は1行ずつ届くので、BATCH_SEC 秒の間に届いた行をまとめて1回で渡す。
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from realtime import AsyncRealtimeClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_SEC = 15
+DEFAULT_LOCAL_POLL_SEC = 1.0
+# Realtime で届いた行をまとめる秒数（最初の行が届いてからこの秒数後に1回で反映する）
+DEFAULT_BATCH_SEC = 1.0
+# 1回のポーリングで取る行数の上限（超えた分は次の回に続きから取る）
+POLL_LIMIT = 200
+CURSOR_COL = "updated_at"
+
+
+class LiveFeed:
+    """受け取った行を table.apply_rows() に渡す（table は attach() で差し替える）"""
+
+    def __init__(self):
+        self.table = None
+        self.received = 0
+        self.last_received = None
+        self.last_error = None
+
+    def attach(self, table):
+        self.table = table
+        return self
+
+    def deliver(self, records):
+        table = self.table
+        if table is None or not records:
+            return
+        table.apply_rows(records)
+        self.received += len(records)
+        self.last_received = time.time()
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+class _PollingThread:
+    """poll() を interval 秒ごとに呼ぶスレッド（PollingFeed / LocalFeed 共通）"""
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                logger.exception("live polling failed")
+                self.last_error = e
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+
+class LocalFeed(_PollingThread, LiveFeed):
+    """テスト用の代替（Supabase に繋がない）
+
+    push() した行をそのまま届ける。path を渡して start() すると、
+    そのファイルに開始後に追記された行（1行に1つの JSON）を interval 秒ごとに届ける。
+    """
+
+    def __init__(self, path=None, interval=DEFAULT_LOCAL_POLL_SEC):
+        super().__init__()
+        self.path = path
+        self.interval = interval
+        self._offset = None
+        self._stop = None
+
+    def push(self, *records):
+        self.deliver(list(records))
+
+    def poll(self):
+        if self.path is None or not os.path.exists(self.path):
+            return 0
+        if self._offset is None:
+            self._offset = os.path.getsize(self.path)
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        # 書きかけの最終行は次の回に読む
+        complete = chunk[: chunk.rfind(b"\n") + 1]
+        self._offset += len(complete)
+        records = [json.loads(line) for line in complete.decode("utf-8").splitlines() if line.strip()]
+        self.deliver(records)
+        return len(records)
+
+    def start(self):
+        if self.path is None:
+            return self
+        self.poll()
+        return super().start()
+
+
+class PollingFeed(_PollingThread, LiveFeed):
+    """updated_at が前回より新しい行を interval 秒ごとに問い合わせる（変更がなければ空の応答だけ）"""
+
+    def __init__(self, client, table_name, team, interval=DEFAULT_POLL_SEC):
+        super().__init__()
+        self.client = client
+        self.table_name = table_name
+        self.team = team
+        self.interval = interval
+        self.cursor = None
+        self._stop = None
+
+    def _query(self):
+        return self.client.table(self.table_name).select("*").eq("team", self.team)
+
+    def poll(self):
+        """新しい行を1回取得して届け、届けた件数を返す"""
+        if self.cursor is None:
+            # 開始時点までの行は読み込み（load / sync）で取得済みとして、それ以降だけを見る
+            latest = self._query().order(CURSOR_COL, desc=True).limit(1).execute().data
+            self.cursor = (latest[0].get(CURSOR_COL) if latest else None) or ""
+            return 0
+        rows = self._query().gt(CURSOR_COL, self.cursor).order(CURSOR_COL).limit(POLL_LIMIT).execute().data
+        if rows:
+            self.deliver(rows)
+            self.cursor = max(str(r[CURSOR_COL]) for r in rows if r.get(CURSOR_COL) is not None)
+        return len(rows)
+
+
+class RealtimeFeed(LiveFeed):
+    """Supabase Realtime でチームの行の追加・更新を受け取る（テーブルの Realtime を有効にしておくこと）"""
+
+    def __init__(self, url, key, table_name, team, schema="public", batch_sec=DEFAULT_BATCH_SEC):
+        super().__init__()
+        self.batch_sec = batch_sec
+        self._batch = []
+        self.url = f"{url.rstrip('/')}/realtime/v1"
+        self.key = key
+        self.table_name = table_name
+        self.team = team
+        self.schema = schema
+        self.state = None
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+
+    def _on_change(self, payload):
+        data = payload.get("data", {})
+        if data.get("type") in ("INSERT", "UPDATE") and data.get("record"):
+            if not self._batch:
+                self._loop.call_later(self.batch_sec, self._flush)
+            self._batch.append(data["record"])
+
+    def _flush(self):
+        records, self._batch = self._batch, []
+        try:
+            self.deliver(records)
+        except Exception as e:
+            logger.exception("%s/%s: failed to apply live rows", self.table_name, self.team)
+            self.last_error = e
+
+    def _on_subscribe(self, state, error):
+        self.state = state
+        if error is not None:
+            logger.warning("%s/%s: realtime subscription %s: %s", self.table_name, self.team, state, error)
+            self.last_error = error
+
+    async def _listen(self):
+        self._stopped = asyncio.Event()
+        client = AsyncRealtimeClient(self.url, self.key)
+        channel = client.channel(f"live:{self.table_name}:{self.team}")
+        channel.on_postgres_changes(
+            "*", self._on_change, table=self.table_name, schema=self.schema, filter=f"team=eq.{self.team}"
+        )
+        try:
+            await channel.subscribe(self._on_subscribe)
+            await self._stopped.wait()
+        finally:
+            if self._batch:
+                self._flush()
+            await client.close()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._listen())
+        except Exception as e:
+            logger.exception("%s/%s: realtime connection failed", self.table_name, self.team)
+            self.last_error = e
+        finally:
+            self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._stopped is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopped.set)
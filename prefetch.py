@@ -0,0 +1,104 @@
+"""上限付きキャッシュと、次に選ばれそうな条件の先読み（裏のスレッドで計算してキャッシュに入れる）"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 64
+
+
+def neighbours(options, value):
+    """options（表示順）の中の value の次と前の値（端なら片方だけ、見つからなければ空）"""
+    options = list(options)
+    if value not in options:
+        return []
+    i = options.index(value)
+    return [options[j] for j in (i + 1, i - 1) if 0 <= j < len(options)]
+
+
+class LRUCache:
+    """キー → 計算結果 の上限付きキャッシュ（古く使われていないものから捨てる）
+
+    get() で見つからなければ呼び出し側で計算して put() する（get_or_build() はその両方）。
+    値は全セッションで共有されるので、呼び出し側で変更しないこと。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class Prefetcher(LRUCache):
+    """LRUCache に先読み用のスレッドを付けたもの
+
+    prefetch() はキャッシュにないキーだけを裏のスレッドで計算して入れる。
+    新しく prefetch() すると、まだ始まっていない前回分は取り消す（選択が変わって不要になるため）。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, workers=1):
+        super().__init__(max_entries)
+        self.prefetched = 0
+        self._pending = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def prefetch(self, jobs):
+        """jobs（(キー, 計算する関数) のリスト）のうちキャッシュにないものを順に裏で計算する"""
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if future.cancel():
+                    del self._pending[key]
+            for key, compute in jobs:
+                if key in self._entries or key in self._pending:
+                    continue
+                self._pending[key] = self._pool.submit(self._run, key, compute)
+
+    def _run(self, key, compute):
+        try:
+            value = compute()
+        except Exception:
+            logger.exception("prefetch failed: %r", key)
+        else:
+            self.put(key, value)
+            with self._lock:
+                self.prefetched += 1
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update(prefetched=self.prefetched, pending=len(self._pending))
+        return stats
@@ -0,0 +1,103 @@
+"""再実行ごとの処理時間の計測（デバッグ用・既定では無効）"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_SAMPLE_INTERVAL_SEC = 0.005
+
+
+class StackSampler:
+    """指定スレッドのスタックを一定間隔で記録するサンプリングプロファイラ
+
+    結果は flamegraph.pl / speedscope で読める collapsed 形式
+    （「関数;関数;…;関数 回数」の行）で書き出す。
+    """
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL_SEC):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RerunProfiler:
+    """スクリプトの節（1) 接続、2) 読み込み …）ごとの処理時間
+
+    mark(label) で前の節を閉じて次の節を始める（節の途中で st.stop() した場合は記録されない）。
+    dump_dir を渡すと、再実行ごとにスタックのサンプリング結果をそこへ書き出す。
+    無効のときはどのメソッドも何もしない。
+    """
+
+    # スレッドごとに動いているサンプラー（st.stop() などで finish() まで来なかった分は次の実行で止める）
+    _samplers = {}
+
+    def __init__(self, enabled=False, dump_dir=None):
+        self.enabled = enabled
+        self.dump_dir = dump_dir if enabled else None
+        self.stages = []
+        self.dump_path = None
+        self._label = None
+        self._start = time.perf_counter()
+        self._started_at = time.time()
+        self._sampler = None
+        thread_id = threading.get_ident()
+        previous = self._samplers.pop(thread_id, None)
+        if previous is not None:
+            previous.stop()
+        if self.dump_dir:
+            self._sampler = self._samplers[thread_id] = StackSampler(thread_id).start()
+
+    def mark(self, label):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._label is not None:
+            self.stages.append((self._label, now - self._start))
+        self._label = label
+        self._start = now
+
+    def finish(self):
+        """最後の節を閉じ、サンプリング結果を書き出して [(節, 秒), ...] を返す"""
+        if not self.enabled:
+            return []
+        self.mark(None)
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._samplers.pop(threading.get_ident(), None)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started_at))
+            millis = int(self._started_at * 1000) % 1000
+            self.dump_path = os.path.join(
+                self.dump_dir, f"rerun_{stamp}-{millis:03d}_{threading.get_ident()}.folded"
+            )
+            self._sampler.write_folded(self.dump_path)
+        return self.stages
@@ -0,0 +1,307 @@
+"""表示用データの組み立て（Streamlit に依存しない部分）
+
+アプリ（data_viewing.py）と同じ処理を、バッチ処理やスクリプトから使えるようにしたもの。
+読み込み → 抽出 → サマリー表・グラフ（Vega-Lite）の順に呼ぶ。
+
+コマンドラインからも使える:
+    python query.py --team kyosera --athletes "山田 太郎" "佐藤 花子" \\
+        --start 2024-04-01 --end 2025-03-31 --metrics "疲労感（mm）" "睡眠時間（h）" --out out/
+
+    python query.py --snapshot snapshots/condition__京セラ__lazy.parquet \\
+        --athletes "山田 太郎" --fiscal-years 2024 --months 4 5 --metrics "RPE" --combined
+
+接続先は環境変数 SUPABASE_URL / SUPABASE_KEY、なければ .streamlit/secrets.toml から読む。
+"""
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+
+import altair as alt
+import pandas as pd
+
+from charts import add_overlay_columns, combined_chart, metric_chart, to_long
+from data_loader import TeamTable, normalize_name, read_snapshot
+from downsample import DEFAULT_MAX_POINTS, downsample
+from rollup import MonthlyRollup
+from schema import metric_dict
+from selection import select_rows, sort_team_frame
+from teams import load_team_registry, resolve_team
+from training_load import LOAD_METRICS, TrainingLoad
+
+YEAR_COL = "fiscal_year"
+
+QueryResult = namedtuple("QueryResult", ["period", "views", "chart"])
+
+
+# -----------------------------
+# 読み込み
+# -----------------------------
+def load_team(client, table_name, team, **fetch_opts):
+    """チームの全列を取得して (frame, rollup) を返す"""
+    table = TeamTable(client, table_name, team, lazy_columns=False, **fetch_opts).load()
+    return table.frame, table.rollup
+
+
+def load_snapshot(path):
+    """アプリが保存したスナップショット（Parquet）から (frame, rollup) を作る"""
+    frame = read_snapshot(path)
+    if frame is None:
+        raise FileNotFoundError(path)
+    frame = sort_team_frame(frame)
+    return frame, MonthlyRollup.build(frame)
+
+
+# -----------------------------
+# 抽出
+# -----------------------------
+def select_athletes(frame, names):
+    """names（name_norm）の選手の行を取り出し、name を選んだ選手だけのカテゴリにする"""
+    df_sel = select_rows(frame, names).copy()
+    # 未選択の選手がカテゴリに残ると groupby で 0 件行が出るので除く
+    df_sel["name"] = df_sel["name_norm"].cat.remove_unused_categories()
+    return df_sel
+
+
+def select_period(frame, names, start=None, end=None, fiscal_years=None, months=None):
+    """選手と期間（start〜end）または年度＋月で絞った行を返す"""
+    return filter_period(select_athletes(frame, names), names, start, end, fiscal_years, months)
+
+
+def filter_period(df_sel, names, start=None, end=None, fiscal_years=None, months=None):
+    """select_athletes() の結果を期間（start〜end）または年度＋月で絞る"""
+    if fiscal_years is None:
+        return select_rows(df_sel, names, start, end)
+    df_year = df_sel[df_sel[YEAR_COL].isin(fiscal_years)].copy()
+    df_year["month"] = df_year["measurement_date"].dt.month
+    if months is None:
+        return df_year
+    return df_year[df_year["month"].isin(months)].copy()
+
+
+# -----------------------------
+# 指標ごとのグラフ用データとサマリー表
+# -----------------------------
+def metric_column(metric_ja):
+    """指標名（日本語）の列名（metric_dict になければ負荷指標）"""
+    return metric_dict.get(metric_ja) or LOAD_METRICS[metric_ja]
+
+
+def add_load_columns(df_period, metrics_ja, training_load):
+    """選んだ指標のうち負荷指標の列を df_period に加える（training_load はチーム全期間の表）"""
+    load_cols = [LOAD_METRICS[m] for m in metrics_ja if m in LOAD_METRICS]
+    if load_cols:
+        values = training_load.lookup(df_period, load_cols)
+        for c in load_cols:
+            df_period[c] = values[c]
+    return df_period
+
+
+def build_metric_view(df_period, metric_ja, overlay=False, rollup=None, names=None, fiscal_years=None,
+                      months=None, max_points=DEFAULT_MAX_POINTS):
+    """1指標分のグラフ用データとサマリー表を dict で返す
+
+    キーは metric_ja, col, chart_df（max_points 点まで間引き済み）, n_plot（間引く前の点数）, summary。
+    表示できないときは warning（列がない）または info（データがない）のメッセージだけを持つ。
+    rollup を渡すと、サマリー表を月単位の集計から作る（年度＋月で選んだとき用。
+    names / fiscal_years / months はそのときの絞り込み条件）。
+    overlay=True は同一選手の年度-月を重ねる表示用（年度-月ごとに集計）。
+    """
+    col = metric_column(metric_ja)
+    if col not in df_period.columns:
+        return dict(metric_ja=metric_ja, warning=f"'{metric_ja}' の列 '{col}' がデータにないため表示できません。")
+
+    use_rollup = rollup is not None and rollup.has(col)
+
+    use_cols = ["measurement_date", "name", YEAR_COL, col]
+    use_cols = [c for c in use_cols if c in df_period.columns]
+
+    plot_df = (
+        df_period.loc[:, use_cols]
+        .dropna(subset=["measurement_date", col])
+        .sort_values(["measurement_date"])
+        .copy()
+    )
+
+    if plot_df.empty:
+        return dict(metric_ja=metric_ja, info=f"{metric_ja} は指定条件のデータがありません。")
+
+    if overlay:
+        plot_df = add_overlay_columns(plot_df)
+        chart_df = downsample(
+            plot_df.sort_values("overlay_date"), "overlay_date", col, "group_key", max_points
+        )
+        group_col, group_title = "year_month_label", "年度-月"
+    else:
+        chart_df = downsample(plot_df, "measurement_date", col, "name", max_points)
+        group_col, group_title = "name", "選手"
+
+    if use_rollup:
+        stats = rollup.summarize(col, names, fiscal_years, months, by=group_col)
+    else:
+        stats = plot_df.groupby(group_col)[col].agg(["count", "mean", "min", "max"]).reset_index()
+    summary = (
+        stats
+        .rename(columns={
+            group_col: group_title,
+            "count": "測定回数",
+            "mean": "平均値",
+            "min": "最小値",
+            "max": "最大値",
+        })
+    )
+    if overlay:
+        summary = summary.sort_values("年度-月")
+    for c in ["平均値", "最小値", "最大値"]:
+        summary[c] = summary[c].astype("float64").round(2)
+
+    return dict(metric_ja=metric_ja, col=col, chart_df=chart_df, n_plot=len(plot_df), summary=summary)
+
+
+def views_chart(views, overlay=False, combined=False):
+    """グラフにできる view の Altair グラフ（combined=True なら1つにまとめ、それ以外は縦に並べる）"""
+    charted = [v for v in views if "chart_df" in v]
+    if not charted:
+        return None
+    if combined:
+        long_df = to_long([(v["metric_ja"], v["col"], v["chart_df"]) for v in charted], overlay=overlay)
+        return combined_chart(long_df, [v["metric_ja"] for v in charted], overlay=overlay)
+    return alt.vconcat(*[
+        metric_chart(v["chart_df"], v["col"], v["metric_ja"], overlay=overlay, zoom_name=f"zoom_{i}")
+        for i, v in enumerate(charted)
+    ])
+
+
+def to_vega_lite(chart):
+    """Vega-Lite の dict にする（st.altair_chart と同じく行数の上限なし）"""
+    with alt.data_transformers.disable_max_rows():
+        return chart.to_dict()
+
+
+def build_views(frame, names, metrics_ja, start=None, end=None, fiscal_years=None, months=None,
+                rollup=None, overlay=False, max_points=DEFAULT_MAX_POINTS, training_load=None):
+    """抽出した行と、指標ごとの build_metric_view() の結果のリストを (period, views) で返す"""
+    period = select_period(frame, names, start, end, fiscal_years, months)
+    if any(m in LOAD_METRICS for m in metrics_ja):
+        if training_load is None:
+            training_load = TrainingLoad.build(frame)
+        period = add_load_columns(period, metrics_ja, training_load)
+    if fiscal_years is None:
+        rollup = None
+    elif months is None:
+        months = sorted(period["month"].unique())
+    views = [
+        build_metric_view(period, m, overlay, rollup, names, fiscal_years, months, max_points)
+        for m in metrics_ja
+    ]
+    return period, views
+
+
+def run_query(frame, names, metrics_ja, start=None, end=None, fiscal_years=None, months=None,
+              rollup=None, overlay=False, combined=False, max_points=DEFAULT_MAX_POINTS, training_load=None):
+    """抽出 → 指標ごとの集計 → グラフまでをまとめて行う
+
+    年度（fiscal_years）を指定したときは年度＋月、しなければ期間（start〜end）で絞る。
+    rollup は年度＋月のときだけサマリー表に使う。
+    負荷指標を選んだときは training_load（省略時は frame から計算）から値を引く。
+    """
+    period, views = build_views(
+        frame, names, metrics_ja, start, end, fiscal_years, months, rollup, overlay, max_points, training_load
+    )
+    return QueryResult(period=period, views=views, chart=views_chart(views, overlay, combined))
+
+
+# -----------------------------
+# コマンドライン
+# -----------------------------
+def _read_secrets(path):
+    if not os.path.exists(path):
+        return {}
+    import tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def add_source_args(parser):
+    """データの取得元（--team / --snapshot）の引数を追加する（load_source() と組で使う）"""
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--team", help="secrets の TEAMS のキー、または Supabase の team 列の値")
+    source.add_argument("--snapshot", help="アプリが保存したスナップショット（Parquet）")
+    parser.add_argument("--table", help="テーブル名（省略時は TEAMS の table / SUPABASE_TABLE）")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"))
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="コンディションデータのサマリー表と Vega-Lite グラフを出力する")
+    add_source_args(parser)
+    parser.add_argument("--athletes", nargs="+", required=True)
+    parser.add_argument("--metrics", nargs="+", required=True, help="指標名（metric_dict / 負荷指標 LOAD_METRICS のキー）")
+    parser.add_argument("--start", help="期間の開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", help="期間の終了日（YYYY-MM-DD）")
+    parser.add_argument("--fiscal-years", nargs="+", type=int, help="年度（指定すると年度＋月で抽出）")
+    parser.add_argument("--months", nargs="+", type=int)
+    parser.add_argument("--overlay", action="store_true", help="年度-月を重ねて描く（同一選手比較）")
+    parser.add_argument("--combined", action="store_true", help="指標を1つのグラフにまとめる（x軸連動）")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS)
+    parser.add_argument("--out", help="サマリー表（CSV）と chart.json を書き出すディレクトリ")
+    return parser.parse_args(argv)
+
+
+def load_source(args):
+    """add_source_args() の引数から (frame, rollup) を読み込む"""
+    if args.snapshot:
+        return load_snapshot(args.snapshot)
+
+    secrets = _read_secrets(args.secrets)
+    url = os.environ.get("SUPABASE_URL") or secrets.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY") or secrets.get("SUPABASE_KEY")
+    if not url or not key:
+        sys.exit("SUPABASE_URL / SUPABASE_KEY が設定されていません。")
+
+    registry = load_team_registry(secrets)
+    # 登録簿のキーでなければ team 列の値として扱う
+    team_cfg = resolve_team(registry, {**secrets, "FIXED_TEAM": args.team})
+    table_name = args.table or team_cfg.table_name or secrets.get("SUPABASE_TABLE")
+    if not table_name:
+        sys.exit("テーブル名がわかりません。--table を指定してください。")
+
+    from supabase import create_client
+    return load_team(create_client(url, key), table_name, team_cfg.team)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    unknown = [m for m in args.metrics if m not in metric_dict and m not in LOAD_METRICS]
+    if unknown:
+        sys.exit(f"未知の指標：{', '.join(unknown)}")
+
+    frame, rollup = load_source(args)
+    names = [normalize_name(a) for a in args.athletes]
+    result = run_query(
+        frame, names, args.metrics,
+        start=pd.Timestamp(args.start) if args.start else None,
+        end=pd.Timestamp(args.end) if args.end else None,
+        fiscal_years=args.fiscal_years, months=args.months, rollup=rollup,
+        overlay=args.overlay, combined=args.combined, max_points=args.max_points,
+    )
+
+    print(f"{len(result.period)} 行（選手：{', '.join(names)}）")
+    for view in result.views:
+        print(f"\n## {view['metric_ja']}")
+        print(view.get("warning") or view.get("info") or view["summary"].to_string(index=False))
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        for view in result.views:
+            if "summary" in view:
+                view["summary"].to_csv(
+                    os.path.join(args.out, f"summary_{view['col']}.csv"), index=False, encoding="utf-8-sig"
+                )
+        if result.chart is not None:
+            with open(os.path.join(args.out, "chart.json"), "w", encoding="utf-8") as f:
+                json.dump(to_vega_lite(result.chart), f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""選手ごとの月次レポートの一括作成
+
+例:
+    python report.py --team kyosera --month 2025-03 --out reports/
+    python report.py --snapshot snapshots/condition__京セラ__lazy.parquet --month 2025-03 --workers 8
+
+チームのデータは最初に1回だけ読み込み、各ワーカープロセスへ1回だけ渡す。
+選手ごとに、アプリの 10) と同じグラフ・サマリー表と 11) のテキスト項目を
+1つの HTML（グラフは Vega-Lite を vega-embed で表示）にまとめ、一覧の index.html も作る。
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import altair as alt
+import pandas as pd
+
+from charts import x_axis_format
+from data_loader import normalize_name
+from query import add_source_args, load_source, run_query, to_vega_lite
+from schema import TEXT_COLS, metric_dict
+from text_items import nonempty_text_rows
+from training_load import LOAD_METRICS, TrainingLoad
+
+DEFAULT_REPORT_METRICS = [
+    "全般的な体調（mm）", "疲労感（mm）", "睡眠時間（h）", "練習強度（mm）", "体重（kg）",
+]
+
+_CDN = "https://cdn.jsdelivr.net/npm"
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{cdn}/vega@{vega}"></script>
+<script src="{cdn}/vega-lite@{vegalite}"></script>
+<script src="{cdn}/vega-embed@{embed}"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+# ワーカーごとのチームデータ（_init_worker() で1回だけ受け取る）と、その負荷指標（初めて使うときに計算）
+_team_frame = None
+_team_load = None
+
+
+def _init_worker(frame):
+    global _team_frame, _team_load
+    _team_frame = frame
+    _team_load = None
+
+
+def _worker_training_load(metrics_ja):
+    global _team_load
+    if _team_load is None and any(m in LOAD_METRICS for m in metrics_ja):
+        _team_load = TrainingLoad.build(_team_frame)
+    return _team_load
+
+
+def _page(title, body):
+    return PAGE_TEMPLATE.format(
+        title=html.escape(title), body=body, cdn=_CDN,
+        vega=alt.VEGA_VERSION.split(".")[0],
+        vegalite=alt.VEGALITE_VERSION.split(".")[0],
+        embed=alt.VEGAEMBED_VERSION.split(".")[0],
+    )
+
+
+def report_filename(name):
+    return re.sub(r'[\\/:*?"<>|\s]', "_", name) + ".html"
+
+
+def athlete_report(name, fiscal_year, month, metrics_ja, frame=None):
+    """1人分の月次レポートの HTML を返す（frame を省略するとワーカーのチームデータを使う）"""
+    training_load = None
+    if frame is None:
+        frame, training_load = _team_frame, _worker_training_load(metrics_ja)
+    result = run_query(
+        frame, [name], metrics_ja, fiscal_years=[fiscal_year], months=[month], training_load=training_load
+    )
+    title = f"{name} ／ {fiscal_year}年度 {month}月"
+    parts = [f"<h1>{html.escape(title)}</h1>", f"<p>測定 {len(result.period)} 日</p>"]
+
+    if result.chart is not None:
+        # テキストに "</script>" が含まれても script 要素が閉じないようにする
+        spec = json.dumps(to_vega_lite(result.chart), ensure_ascii=False).replace("</", "<\\/")
+        parts.append(f'<div id="chart"></div>\n<script>vegaEmbed("#chart", {spec});</script>')
+
+    for view in result.views:
+        parts.append(f"<h2>{html.escape(view['metric_ja'])}</h2>")
+        if "summary" in view:
+            parts.append(view["summary"].to_html(index=False))
+        else:
+            parts.append(f"<p>{html.escape(view.get('warning') or view.get('info'))}</p>")
+
+    parts.append("<h2>テキスト項目</h2>")
+    text_cols = [(ja, col) for (ja, col) in TEXT_COLS if col in result.period.columns]
+    texts = nonempty_text_rows(result.period, [col for (_, col) in text_cols]) if text_cols else pd.DataFrame()
+    if texts.empty:
+        parts.append("<p>テキスト入力はありません。</p>")
+    else:
+        dates = result.period.loc[texts.index, "measurement_date"].dt.strftime(x_axis_format)
+        text_df = texts.rename(columns={col: ja for (ja, col) in text_cols})
+        text_df.insert(0, "測定日", dates)
+        parts.append(text_df.to_html(index=False))
+
+    return _page(title, "\n".join(parts))
+
+
+def _write_report(out_dir, name, fiscal_year, month, metrics_ja):
+    path = os.path.join(out_dir, report_filename(name))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(athlete_report(name, fiscal_year, month, metrics_ja))
+    return name, path
+
+
+def month_fiscal_year(frame, month):
+    """month（pd.Period）に測定日がある行の年度（データの fiscal_year 列から。行がなければ None）"""
+    in_month = frame["measurement_date"].dt.to_period("M") == month
+    years = frame.loc[in_month, "fiscal_year"].dropna()
+    if years.empty:
+        return None
+    # 年度の区切りは月単位なので1つに決まるはず（混在していれば多い方）
+    return int(years.mode().iloc[0])
+
+
+def write_team_reports(frame, fiscal_year, month, metrics_ja, out_dir, names=None, workers=None):
+    """names（省略時はその月に測定のある全選手）の月次レポートを out_dir に書き出し、{選手: パス} を返す"""
+    month_rows = frame[(frame["fiscal_year"] == fiscal_year) & (frame["measurement_date"].dt.month == month)]
+    if names is None:
+        names = sorted(n for n in month_rows["name_norm"].astype(str).unique() if n)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # 選手のいずれかが含まれる行だけをワーカーに渡す
+    frame = frame[frame["name_norm"].isin(names)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(frame,)) as pool:
+        futures = [pool.submit(_write_report, out_dir, name, fiscal_year, month, metrics_ja) for name in names]
+        paths = dict(f.result() for f in futures)
+
+    items = "\n".join(
+        f'<li><a href="{html.escape(os.path.basename(paths[name]))}">{html.escape(name)}</a></li>' for name in names
+    )
+    title = f"{fiscal_year}年度 {month}月 月次レポート"
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(_page(title, f"<h1>{html.escape(title)}</h1>\n<ul>\n{items}\n</ul>"))
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="選手ごとの月次レポート（HTML）を一括で作る")
+    add_source_args(parser)
+    parser.add_argument("--month", required=True, help="対象月（YYYY-MM）")
+    parser.add_argument("--metrics", nargs="+", default=DEFAULT_REPORT_METRICS)
+    parser.add_argument("--athletes", nargs="+", help="省略時はその月に測定のある全選手")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時は CPU 数）")
+    parser.add_argument("--out", default="reports")
+    args = parser.parse_args(argv)
+
+    unknown = [m for m in args.metrics if m not in metric_dict and m not in LOAD_METRICS]
+    if unknown:
+        sys.exit(f"未知の指標：{', '.join(unknown)}")
+    month = pd.Period(args.month, freq="M")
+
+    start = time.perf_counter()
+    frame, _ = load_source(args)
+    loaded = time.perf_counter() - start
+    fiscal_year = month_fiscal_year(frame, month)
+    if fiscal_year is None:
+        sys.exit(f"{month} に測定日のあるデータがありません。")
+    paths = write_team_reports(
+        frame, fiscal_year, month.month, args.metrics, os.path.join(args.out, str(month)),
+        names=[normalize_name(a) for a in args.athletes] if args.athletes else None, workers=args.workers,
+    )
+    print(f"{len(paths)} 人分のレポートを作成しました（読み込み {loaded:.1f} 秒・"
+          f"合計 {time.perf_counter() - start:.1f} 秒）：{os.path.join(args.out, str(month))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""選手 × 年度 × 月 × 指標の集計（サマリー表をこの集計から作る）"""
+import pandas as pd
+
+from schema import COLUMN_TYPES
+from selection import select_rows
+
+ROLLUP_KEYS = ["name_norm", "fiscal_year", "month_start"]
+
+
+def rollup_columns(frame):
+    """集計対象の列（frame にある数値の指標列）"""
+    return [c for c, t in COLUMN_TYPES.items() if t.startswith("float") and c in frame.columns]
+
+
+def _aggregate(frame, cols):
+    """frame を (選手, 年度, 月初日) ごとに集計し、列が (指標, 統計量) の DataFrame を返す"""
+    keys = [
+        frame["name_norm"],
+        frame["fiscal_year"],
+        frame["measurement_date"].dt.to_period("M").dt.start_time.rename("month_start"),
+    ]
+    values = frame[cols].astype("float64")
+    grouped = values.groupby(keys, observed=True)
+    stats = {
+        "count": grouped.count(),
+        "sum": grouped.sum(),
+        "min": grouped.min(),
+        "max": grouped.max(),
+        "sumsq": (values ** 2).groupby(keys, observed=True).sum(),
+    }
+    table = pd.concat(stats, axis=1).swaplevel(axis=1).sort_index(axis=1)
+    table.index.names = ROLLUP_KEYS
+    return table
+
+
+class MonthlyRollup:
+    """月単位の集計（count / sum / min / max / 二乗和）
+
+    読み込み時に build() で作り、差分同期では変更のあった（選手, 月）だけ、
+    列の追加取得ではその列だけを集計し直す。どちらも新しいオブジェクトを返す。
+    """
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else pd.DataFrame()
+
+    @classmethod
+    def build(cls, frame):
+        cols = rollup_columns(frame)
+        if frame.empty or not cols:
+            return cls()
+        return cls(_aggregate(frame, cols))
+
+    def has(self, col):
+        return col in self.table.columns.get_level_values(0)
+
+    def add_columns(self, frame, cols):
+        """追加取得した列の集計を加える"""
+        cols = [c for c in rollup_columns(frame) if c in cols and not self.has(c)]
+        if not cols:
+            return self
+        extra = _aggregate(frame, cols)
+        if self.table.empty:
+            return MonthlyRollup(extra)
+        return MonthlyRollup(self.table.join(extra, how="outer").sort_index(axis=1))
+
+    def update(self, frame, delta):
+        """delta の行がある（選手, 月）だけを frame から集計し直す"""
+        cols = [c for c in rollup_columns(frame) if self.has(c)]
+        if delta.empty or not cols:
+            return self
+
+        months = delta["measurement_date"].dt.to_period("M")
+        dirty = pd.DataFrame({"name_norm": delta["name_norm"].astype(str), "month": months}).drop_duplicates()
+        parts = [
+            select_rows(frame, [name], month.start_time, month.end_time)
+            for name, month in dirty.itertuples(index=False)
+        ]
+        fresh = _aggregate(pd.concat(parts), cols)
+
+        index = self.table.index
+        stale = pd.MultiIndex.from_arrays([
+            index.get_level_values("name_norm").astype(str),
+            index.get_level_values("month_start").to_period("M"),
+        ]).isin(pd.MultiIndex.from_frame(dirty))
+        table = pd.concat([self.table.loc[~stale, cols], fresh]).sort_index().sort_index(axis=1)
+        return MonthlyRollup(table)
+
+    def summarize(self, col, names, fiscal_years, months, by):
+        """選手・年度・月で絞った集計を by ごとにまとめる
+
+        by="name" なら選手ごと、by="year_month_label" なら「年度-月」ごと。
+        列は [by, count, mean, min, max]（生データの groupby().agg() と同じ形）。
+        """
+        t = self.table[col]
+        index = t.index
+        mask = (
+            index.get_level_values("name_norm").isin(names)
+            & index.get_level_values("fiscal_year").isin(fiscal_years)
+            & index.get_level_values("month_start").month.isin(months)
+            & (t["count"] > 0).to_numpy()
+        )
+        t = t[mask]
+        if by == "name":
+            key = t.index.get_level_values("name_norm").astype(str)
+        else:
+            key = (
+                t.index.get_level_values("fiscal_year").astype(str)
+                + "-"
+                + t.index.get_level_values("month_start").month.astype(str)
+            )
+        grouped = t.groupby(pd.Index(key, name=by))
+        counts = grouped["count"].sum()
+        return pd.DataFrame({
+            "count": counts.astype("int64"),
+            "mean": grouped["sum"].sum() / counts,
+            "min": grouped["min"].min(),
+            "max": grouped["max"].max(),
+        }).reset_index()
@@ -0,0 +1,152 @@
+"""列の定義（指標名・軸設定・テキスト列）と読み込み時に適用する型"""
+import pandas as pd
+
+# -----------------------------
+# 指標名（日本語 ↔ Supabase列名）
+# -----------------------------
+metric_dict = {
+    "全般的な体調（mm）": "general_condition_mm",
+    "疲労感（mm）": "fatigue_mm",
+    "睡眠時間（h）": "sleep_hours",
+    "睡眠の深さ（mm）": "sleep_depth_mm",
+    "睡眠状況": "sleep_status",
+    "食欲（mm）": "appetite_mm",
+    "故障の程度（mm）": "injury_severity_mm",
+    "練習強度（mm）": "training_intensity_mm",
+    "便の形": "stool_form",
+    "走行距離（km）": "distance_km",
+    "SpO2（%）": "spo2",
+    "心拍数（bpm）": "heart_rate",
+    "体温（℃）": "body_temp",
+    "体重（kg）": "body_mass",
+    "特記事項": "notes",
+    "体重変化率（%）": "body_mass_change_pct",
+    "sRPE": "srpe",
+    "トレーニング時間（min）": "training_time_min",
+    "RPE": "rpe",
+    "d-ROMs": "d_roms",
+    "BAP": "bap",
+    "BAP/d-ROMs": "bap_droms_ratio",
+    "CK": "ck",
+    "TP": "tp",
+    "HF": "hf",
+    "LF": "lf",
+    "LF/HF": "lf_hf_ratio",
+    "ヘモグロビン濃度": "hb_conc",
+    "総ヘモグロビン量": "hbmass",
+    "総ヘモグロビン量/体重": "hbmass_per_kg",
+    "推定VO2max/体重": "vo2max_per_kg",
+    "蛋白": "pro",
+    "クレアチニン": "cre",
+    "pH": "ph",
+    "尿比重": "sg",
+    "その他": "another",
+    "備考": "remarks",
+}
+
+# -----------------------------
+# 軸設定（項目ごと）
+# -----------------------------
+axis_config = {
+    "全般的な体調（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
+    "疲労感（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
+    "睡眠の深さ（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
+    "食欲（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
+    "故障の程度（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
+    "練習強度（mm）": {"y_domain": (0, 100), "y_zero": True, "tick_step": 10},
+
+    "睡眠時間（h）": {"y_domain": (0, 12), "y_zero": True, "tick_step": 1},
+    "トレーニング時間（min）": {"y_domain": (0, 300), "y_zero": True, "tick_step": 30},
+    "走行距離（km）": {"y_domain": (0, 50), "y_zero": True, "tick_step": 5},
+
+    "SpO2（%）": {"y_domain": (88, 100), "y_zero": False, "tick_step": 1},
+    "心拍数（bpm）": {"y_domain": (30, 80), "y_zero": False, "tick_step": 5},
+    "体温（℃）": {"y_domain": (34, 40), "y_zero": False, "tick_step": 0.5},
+
+    "RPE": {"y_domain": (0, 10), "y_zero": True, "tick_step": 1},
+    "pH": {"y_domain": (4, 9), "y_zero": False, "tick_step": 1},
+    "尿比重": {"y_domain": (1.000, 1.040), "y_zero": False, "tick_step": 0.005},
+}
+
+# -----------------------------
+# テキスト列
+# -----------------------------
+INJURY_LOC_COL = "injury_location"  # 必要なら変更
+TEXT_COLS = [
+    ("睡眠状況", "sleep_status"),
+    ("故障の箇所", INJURY_LOC_COL),
+    ("特記事項", "notes"),
+    ("その他", "another"),
+    ("備考", "remarks"),
+]
+
+# -----------------------------
+# 数値として扱わない列
+# -----------------------------
+NON_NUMERIC_COLS = {"sleep_status", "notes", "another", "remarks", "stool_form", INJURY_LOC_COL}
+
+# 選択肢が決まっているテキスト列（Categorical で持つ）
+CATEGORICAL_COLS = {"sleep_status", "stool_form", INJURY_LOC_COL}
+
+# float32 で持つ列（整数値か 0〜100 の mm 値。小数を含む測定値は float64 のまま）
+FLOAT32_COLS = {
+    "general_condition_mm", "fatigue_mm", "sleep_depth_mm", "appetite_mm",
+    "injury_severity_mm", "training_intensity_mm",
+    "spo2", "heart_rate", "srpe", "training_time_min", "rpe",
+    "d_roms", "bap", "ck",
+}
+
+# -----------------------------
+# 読み込み時に適用する型
+# -----------------------------
+def _column_types():
+    types = {"measurement_date": "datetime", "fiscal_year": "Int16"}
+    for col in list(metric_dict.values()) + [col for (_, col) in TEXT_COLS]:
+        if col in CATEGORICAL_COLS:
+            types[col] = "category"
+        elif col in NON_NUMERIC_COLS:
+            continue  # 自由記述はそのまま
+        elif col in FLOAT32_COLS:
+            types[col] = "float32"
+        else:
+            types[col] = "float64"
+    return types
+
+
+COLUMN_TYPES = _column_types()
+
+
+def _has_type(values, dtype):
+    if dtype == "datetime":
+        return pd.api.types.is_datetime64_any_dtype(values)
+    if dtype == "category":
+        return isinstance(values.dtype, pd.CategoricalDtype)
+    return values.dtype == dtype
+
+
+def apply_schema(df, report=None, columns=None):
+    """COLUMN_TYPES の型に揃える（df にある列だけ。変換済みの列はそのまま）
+
+    columns を渡すとその列だけを対象にする。
+    report に dict を渡すと、値があったのに変換できず欠損になった件数を列ごとに加算する。
+    """
+    for col, dtype in COLUMN_TYPES.items():
+        if columns is not None and col not in columns:
+            continue
+        if col not in df.columns or _has_type(df[col], dtype):
+            continue
+        values = df[col]
+        if dtype == "category":
+            df[col] = values.astype("category")
+            continue
+        if dtype == "datetime":
+            converted = pd.to_datetime(values, errors="coerce")
+        else:
+            converted = pd.to_numeric(values, errors="coerce").astype(dtype)
+        if report is not None:
+            had_value = values.notna() & (values.astype(str).str.strip() != "")
+            failed = int((had_value & converted.isna()).sum())
+            if failed:
+                report[col] = report.get(col, 0) + failed
+        df[col] = converted
+    return df
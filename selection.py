@@ -0,0 +1,41 @@
+"""(選手, 測定日) で並べたチームデータからの範囲抽出"""
+import numpy as np
+import pandas as pd
+
+SORT_COLS = ["name_norm", "measurement_date"]
+
+
+def sort_team_frame(df):
+    """name_norm（カテゴリ順）→ 測定日の順に並べ、index を振り直す
+
+    select_rows() はこの並び順を前提に二分探索で範囲を切り出す。
+    """
+    if df.empty:
+        return df
+    return df.sort_values(SORT_COLS, kind="stable").reset_index(drop=True)
+
+
+def select_rows(df, names, start=None, end=None):
+    """sort_team_frame() 済みの df から、names の選手の start〜end（両端含む）の行を取り出す
+
+    選手ごとの行のまとまりと、その中の測定日をどちらも二分探索で探すので、
+    処理量はチーム全体の行数ではなく、取り出す行数に比例する。結果も同じ並び順になる。
+    """
+    codes = df["name_norm"].cat.codes.to_numpy()
+    dates = df["measurement_date"].to_numpy()
+    name_codes = df["name_norm"].cat.categories.get_indexer(list(names))
+    start = None if start is None else pd.Timestamp(start).to_datetime64()
+    end = None if end is None else pd.Timestamp(end).to_datetime64()
+
+    positions = []
+    for code in sorted(set(name_codes[name_codes >= 0])):
+        lo = int(np.searchsorted(codes, code, "left"))
+        hi = int(np.searchsorted(codes, code, "right"))
+        block = dates[lo:hi]
+        first = lo if start is None else lo + int(np.searchsorted(block, start, "left"))
+        last = hi if end is None else lo + int(np.searchsorted(block, end, "right"))
+        positions.append(np.arange(first, last))
+
+    if not positions:
+        return df.iloc[:0]
+    return df.iloc[np.concatenate(positions)]
@@ -0,0 +1,46 @@
+"""チーム登録簿（1つのアプリで複数チームを表示するための設定）"""
+from collections import namedtuple
+
+# key: URL の ?team= に使う識別子 / team: Supabase の team 列の値 / label: 画面表示名
+TeamConfig = namedtuple("TeamConfig", ["key", "team", "table_name", "label"])
+
+
+def load_team_registry(secrets):
+    """secrets の [TEAMS.<key>] からチーム一覧を作る
+
+    例:
+        [TEAMS.kyosera]
+        team  = "京セラ"
+        table = "condition"   # 省略時は SUPABASE_TABLE
+        label = "京セラ"       # 省略時は team
+    """
+    default_table = secrets.get("SUPABASE_TABLE")
+    registry = {}
+    for key, conf in secrets.get("TEAMS", {}).items():
+        team = conf.get("team", key)
+        registry[key] = TeamConfig(
+            key=key,
+            team=team,
+            table_name=conf.get("table", default_table),
+            label=conf.get("label", team),
+        )
+    return registry
+
+
+def resolve_team(registry, secrets, requested=None):
+    """表示するチームを決める（決まらなければ None）
+
+    FIXED_TEAM があればそのチームに固定し、URL での切り替えは受け付けない（従来のチーム別デプロイ）。
+    なければ requested（URL の ?team=）、それもなければ DEFAULT_TEAM を使う。
+    未登録の key を指定された場合は KeyError。
+    """
+    fixed = secrets.get("FIXED_TEAM")
+    if fixed:
+        if fixed in registry:
+            return registry[fixed]
+        return TeamConfig(key=fixed, team=fixed, table_name=secrets.get("SUPABASE_TABLE"), label=fixed)
+
+    key = requested or secrets.get("DEFAULT_TEAM")
+    if key is None:
+        return None
+    return registry[key]
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from data_loader import TeamDataCache, changed_rows, merge_rows
+
+
+def _frame(values):
+    return pd.DataFrame({
+        "name": ["A", "A", "B"],
+        "measurement_date": pd.to_datetime(["2024-04-01", "2024-04-02", "2024-04-02"]),
+        "fatigue_mm": values,
+        "sleep_status": pd.Categorical(["良好", None, "良好"]),
+    })
+
+
+def test_changed_rows_drops_refetched_rows():
+    base = _frame([10.0, None, 30.0])
+    refetched = base.iloc[1:].copy()
+    refetched["sleep_status"] = pd.Categorical(refetched["sleep_status"].astype(object))
+    assert changed_rows(base, refetched).empty
+    assert merge_rows(base, changed_rows(base, refetched)) is base
+
+
+def test_changed_rows_keeps_edits_and_new_rows():
+    base = _frame([10.0, None, 30.0])
+    new = pd.DataFrame({
+        "name": ["A", "B", "C"],
+        "measurement_date": pd.to_datetime(["2024-04-02", "2024-04-02", "2024-04-02"]),
+        "fatigue_mm": [20.0, 30.0, 5.0],
+        "sleep_status": pd.Categorical([None, "良好", None]),
+    })
+    assert changed_rows(base, new)["name"].tolist() == ["A", "C"]
+
+
+def test_team_data_cache_evicts_least_recently_used():
+    cache = TeamDataCache(ttl_sec=600, max_entries=2)
+    cache.get(("t", "A", "table"), lambda: "table")
+    cache.get(("t", "A", ("filter", 1)), lambda: 1)
+    # 使われたエントリは残り、使われていないものから捨てられる
+    assert cache.get(("t", "A", "table"), lambda: "reloaded") == "table"
+    cache.get(("t", "A", ("filter", 2)), lambda: 2)
+    assert cache.get(("t", "A", "table"), lambda: "reloaded") == "table"
+    assert cache.get(("t", "A", ("filter", 1)), lambda: "refetched") == "refetched"
+
+
+def test_changed_rows_keeps_rows_with_untracked_columns():
+    base = _frame([10.0, None, 30.0]).drop(columns=["fatigue_mm"])
+    new = _frame([10.0, None, 31.0])
+    assert len(changed_rows(base, new)) == 3
+
+
+def test_changed_rows_compares_nullable_values():
+    base = _frame([10.0, None, 30.0])
+    base["fiscal_year"] = pd.array([2024, None, 2024], dtype="Int16")
+    new = base.copy()
+    new["fiscal_year"] = pd.array([None, 2024, 2024], dtype="Int16")
+    assert changed_rows(base, new)["measurement_date"].dt.day.tolist() == [1, 2]
+    assert changed_rows(base, base.copy()).empty
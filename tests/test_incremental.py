@@ -0,0 +1,114 @@
+"""差分同期の update() が、マージ後の frame から build() し直したものと一致するか"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from baseline import SOURCE_COLS as BASELINE_SOURCE_COLS, BaselineAlerts
+from data_loader import TeamTable, merge_rows, prepare_frame
+from rollup import MonthlyRollup
+from selection import sort_team_frame
+from text_index import TextIndex
+from training_load import TrainingLoad
+
+TEXT = ["notes", "remarks"]
+
+
+def _rows(names, days, seed):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for name in names:
+        for day in pd.date_range("2024-03-01", periods=days):
+            if rng.random() < 0.15:
+                continue
+            rows.append({
+                "name": name,
+                "measurement_date": day.strftime("%Y-%m-%d"),
+                "fiscal_year": day.year if day.month >= 4 else day.year - 1,
+                "fatigue_mm": float(rng.integers(0, 100)),
+                "sleep_hours": float(rng.uniform(4, 10)),
+                "srpe": float(rng.integers(100, 900)) if rng.random() < 0.8 else None,
+                "rpe": float(rng.integers(1, 10)),
+                "training_time_min": float(rng.integers(30, 180)),
+                "distance_km": float(rng.uniform(0, 30)),
+                "notes": str(rng.choice(["", "膝が痛い", "発熱"])),
+                "remarks": str(rng.choice(["", "遠征"])),
+            })
+    return rows
+
+
+@pytest.fixture
+def frames():
+    old = sort_team_frame(prepare_frame(pd.DataFrame(_rows(["A", "B", "C"], 90, seed=0))))
+    edits = old[old["name"] == "A"].iloc[[40]][["name", "measurement_date"]]
+    delta_rows = [
+        # 古い行の修正（移動窓・EWMA の途中から計算し直しになる）
+        {**_rows(["A"], 1, seed=1)[0], "measurement_date": edits["measurement_date"].iloc[0].strftime("%Y-%m-%d"),
+         "fatigue_mm": 99.0, "srpe": 2000.0, "notes": "", "remarks": "腰"},
+        # 既存の選手の新しい日と、新しい選手
+        {**_rows(["B"], 1, seed=2)[0], "measurement_date": "2024-06-05", "fiscal_year": 2024},
+        *_rows(["D"], 10, seed=3),
+    ]
+    delta = prepare_frame(pd.DataFrame(delta_rows))
+    return old, sort_team_frame(merge_rows(old, delta)), delta
+
+
+def test_training_load_update_matches_build(frames):
+    old, new, delta = frames
+    updated = TrainingLoad.build(old).update(new, delta).table
+    pd.testing.assert_frame_equal(updated.sort_index(), TrainingLoad.build(new).table.sort_index())
+
+
+def test_rollup_update_matches_build(frames):
+    old, new, delta = frames
+
+    def table(rollup):
+        # 差分で足した行は連結で name_norm の水準が Categorical でなくなるので、値で比べる
+        t = rollup.table.reset_index()
+        t["name_norm"] = t["name_norm"].astype(str)
+        return t.set_index(rollup.table.index.names).sort_index()
+
+    pd.testing.assert_frame_equal(table(MonthlyRollup.build(old).update(new, delta)), table(MonthlyRollup.build(new)))
+
+
+def test_baseline_update_matches_build(frames):
+    old, new, delta = frames
+
+    def table(alerts):
+        return alerts.table.sort_values(["name_norm", "metric"]).reset_index(drop=True)
+
+    for method in ("mean", "median"):
+        updated = BaselineAlerts.build(old, method, 14, min_count=3).update(new, delta)
+        pd.testing.assert_frame_equal(table(updated), table(BaselineAlerts.build(new, method, 14, min_count=3)),
+                                      check_dtype=False)
+
+
+def test_team_table_updates_fetched_baseline_rows(frames):
+    old, new, delta = frames
+
+    def table(alerts):
+        return alerts.table.sort_values(["name_norm", "metric"]).reset_index(drop=True)
+
+    # 遅延モード：frame はキー列だけで、指標列は別に取得した baseline_rows にある
+    team = TeamTable(None, "cond", "T1")
+    team.frame = old[["name", "measurement_date", "fiscal_year", "name_norm"]]
+    team.missing_columns = {c for c in BASELINE_SOURCE_COLS if c not in old.columns}
+    team.baseline_rows = old
+    team.baseline_since = old["measurement_date"].min()
+    team.baselines = {("mean", 14): BaselineAlerts.build(old, "mean", 14, min_count=3)}
+    # 指標列付きで届いた行は取り直さずにマージする
+    team.apply_rows(delta.drop(columns="name_norm").to_dict("records"))
+    assert not team._baseline_stale
+    pd.testing.assert_frame_equal(table(team.baselines[("mean", 14)]),
+                                  table(BaselineAlerts.build(new, "mean", 14, min_count=3)), check_dtype=False)
+    # 指標列のない行は、その選手だけを取り直し待ちにする
+    team.apply_rows([{"name": "B", "measurement_date": "2024-06-06", "fiscal_year": 2024}])
+    assert team._baseline_stale == {"B"}
+
+
+def test_text_index_update_matches_build(frames):
+    old, new, delta = frames
+    updated = TextIndex.build(old, TEXT).update(delta)
+    rebuilt = TextIndex.build(new, TEXT)
+    assert updated.docs == rebuilt.docs
+    assert updated.names == rebuilt.names
+    assert dict(updated.postings) == dict(rebuilt.postings)
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from text_index import TextIndex
+from text_items import clean_text, nonempty_text_rows
+
+
+def test_clean_text_categorical():
+    values = pd.Series([" 良い ", None, "悪い", "nan"], dtype="category")
+    assert clean_text(values).tolist() == ["良い", "", "悪い", ""]
+
+
+def test_clean_text_all_null_categorical():
+    values = pd.Series([None, None], dtype="category")
+    assert len(values.cat.categories) == 0
+    assert clean_text(values).tolist() == ["", ""]
+
+
+def test_all_null_categorical_column_in_text_rows_and_index():
+    frame = pd.DataFrame({
+        "name": ["A", "B"],
+        "name_norm": pd.Categorical(["A", "B"]),
+        "measurement_date": pd.to_datetime(["2024-04-01", "2024-04-02"]),
+        "sleep_status": pd.Series([None, None], dtype="category"),
+        "notes": ["膝が痛い", None],
+    })
+    rows = nonempty_text_rows(frame, ["sleep_status", "notes"])
+    assert rows["notes"].tolist() == ["膝が痛い"]
+    assert rows["sleep_status"].tolist() == [""]
+
+    index = TextIndex.build(frame, ["sleep_status", "notes"])
+    assert index.search("膝")["name_norm"].tolist() == ["A"]
+
+
+def test_text_index_keeps_rows_with_name_variants_apart():
+    frame = pd.DataFrame({
+        "name": ["山田 太郎", "山田　太郎"],
+        "name_norm": pd.Categorical(["山田 太郎", "山田 太郎"]),
+        "measurement_date": pd.to_datetime(["2024-04-01", "2024-04-01"]),
+        "notes": ["発熱", "膝が痛い"],
+    })
+    index = TextIndex.build(frame, ["notes"])
+    assert index.search("発熱")["name_norm"].tolist() == ["山田 太郎"]
+    assert len(index.search("膝")) == 1
+
+    index.update(frame.iloc[[1]].assign(notes=["腰"]))
+    assert len(index.search("発熱")) == 1
+    assert index.search("膝").empty
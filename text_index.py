@@ -0,0 +1,105 @@
+"""テキスト項目の全文検索（文字 n-gram の転置インデックス）"""
+import threading
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+from text_items import clean_text
+
+DEFAULT_GRAM_SIZE = 2
+
+
+def normalize_text(text):
+    """検索用に表記を揃える（NFKC で全角英数・半角カナを統一し、英字は小文字）"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+class TextIndex:
+    """行（元の name, 測定日）ごとのテキストを文字 n-gram で引けるようにした転置インデックス
+
+    日本語は単語の区切りがないので、1〜n 文字の部分文字列をすべて登録する。
+    検索語の n-gram をすべて含む行を候補にし、最後に部分一致で確かめる。
+    差分同期では update() で変更のあった行だけ登録し直す。
+    キーは frame の upsert キー（元の name, 測定日）なので、表記揺れで name_norm が同じ行どうしも別々に持つ。
+    """
+
+    def __init__(self, cols, n=DEFAULT_GRAM_SIZE):
+        self.cols = list(cols)
+        self.n = n
+        # (name, 測定日) -> {列: テキスト}（入力のある列だけ）
+        self.docs = {}
+        # (name, 測定日) -> name_norm（表示用）
+        self.names = {}
+        # n-gram -> その n-gram を含む (name, 測定日) の集合
+        self.postings = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, frame, cols, n=DEFAULT_GRAM_SIZE):
+        return cls(cols, n).update(frame)
+
+    def _grams(self, doc):
+        text = normalize_text("\n".join(doc.values()))
+        return {
+            text[i:i + k]
+            for k in range(1, self.n + 1)
+            for i in range(len(text) - k + 1)
+        }
+
+    def _remove(self, key):
+        doc = self.docs.pop(key, None)
+        self.names.pop(key, None)
+        if doc is None:
+            return
+        for gram in self._grams(doc):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+
+    def update(self, rows):
+        """rows（name・name_norm・measurement_date と self.cols を持つ frame）の行を登録し直す"""
+        cols = [c for c in self.cols if c in rows.columns]
+        if rows.empty or not cols:
+            return self
+        texts = {c: clean_text(rows[c]).to_numpy() for c in cols}
+        keys = zip(rows["name"], rows["measurement_date"])
+        names = rows["name_norm"].astype(str).to_numpy()
+        with self._lock:
+            for i, key in enumerate(keys):
+                self._remove(key)
+                doc = {c: texts[c][i] for c in cols if texts[c][i]}
+                if not doc:
+                    continue
+                self.docs[key] = doc
+                self.names[key] = names[i]
+                for gram in self._grams(doc):
+                    self.postings[gram].add(key)
+        return self
+
+    def search(self, query):
+        """query を含む行を新しい順に返す（列は name_norm, measurement_date と self.cols）"""
+        q = normalize_text(query.strip())
+        out_cols = ["name_norm", "measurement_date"] + self.cols
+        if not q:
+            return pd.DataFrame(columns=out_cols)
+
+        k = min(len(q), self.n)
+        grams = {q[i:i + k] for i in range(len(q) - k + 1)}
+        with self._lock:
+            # 件数の少ない n-gram から絞り込む
+            postings = sorted((self.postings.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+            rows = []
+            for key in candidates:
+                doc = self.docs[key]
+                if any(q in normalize_text(text) for text in doc.values()):
+                    rows.append({"name_norm": self.names[key], "measurement_date": key[1], **doc})
+
+        result = pd.DataFrame(rows, columns=out_cols)
+        for col in self.cols:
+            result[col] = result[col].fillna("")
+        return result.sort_values(
+            ["measurement_date", "name_norm"], ascending=[False, True], kind="stable"
+        ).reset_index(drop=True)
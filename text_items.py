@@ -0,0 +1,46 @@
+"""テキスト項目（睡眠状況・故障の箇所・特記事項など）の表示用処理"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_TEXT_PAGE_SIZE = 50
+
+# astype(str) で欠損が文字列になったもの（入力なしとして扱う）
+_MISSING_STRINGS = ["nan", "None", "NaT"]
+
+
+def clean_text(values):
+    """前後の空白を除いた文字列にする（欠損は ""）
+
+    Categorical は選択肢ごとに1回だけ整えてから行に展開する。
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        labels = clean_text(pd.Series(values.cat.categories, dtype=object)).to_numpy()
+        codes = values.cat.codes.to_numpy()
+        if len(labels) == 0:
+            # 全件欠損（カテゴリなし）
+            return pd.Series("", index=values.index, dtype=object)
+        return pd.Series(np.where(codes >= 0, labels[np.maximum(codes, 0)], ""), index=values.index, dtype=object)
+
+    text = values.where(values.notna(), "").astype(str).str.strip()
+    return text.mask(text.isin(_MISSING_STRINGS), "")
+
+
+def nonempty_text_rows(frame, cols):
+    """cols のどれかに入力がある行だけを、整えたテキスト列で新しい順（同日は選手名順）に返す
+
+    index は frame の index のまま（測定日などは frame.loc[index] で引く）。
+    """
+    texts = pd.DataFrame({col: clean_text(frame[col]) for col in cols}, index=frame.index)
+    keep = (texts != "").any(axis=1)
+    order = (
+        frame.loc[keep, ["measurement_date", "name"]]
+        .sort_values(["measurement_date", "name"], ascending=[False, True], kind="stable")
+        .index
+    )
+    return texts.loc[order]
+
+
+def page_bounds(total, page, page_size):
+    """page（1始まり）の [start, end) を返す"""
+    start = (page - 1) * page_size
+    return start, min(start + page_size, total)
@@ -0,0 +1,197 @@
+"""トレーニング負荷の移動窓指標（急性・慢性負荷、ACWR、モノトニー、ストレイン）
+
+選手ごとに初回〜最終の記録日までの毎日の負荷を並べ（記録のない日は負荷 0 = 休養日とみなす）、
+チーム全員分をまとめて計算する。
+  - 急性負荷：直近 7 日の平均 / EWMA（span 7）
+  - 慢性負荷：直近 28 日の平均 / EWMA（span 28）
+  - ACWR：急性 ÷ 慢性
+  - モノトニー：直近 7 日の平均 ÷ 標準偏差、ストレイン：直近 7 日の合計 × モノトニー
+"""
+import numpy as np
+import pandas as pd
+
+from selection import select_rows
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+# 負荷の元になる列（sRPE が空の日は RPE × トレーニング時間で補う）
+LOAD_BASES = {"srpe": "sRPE", "distance_km": "走行距離"}
+SOURCE_COLS = ["srpe", "rpe", "training_time_min", "distance_km"]
+
+_STATS = [
+    ("acute7", "急性負荷（7日平均）"),
+    ("chronic28", "慢性負荷（28日平均）"),
+    ("acute_ewma", "急性負荷（EWMA 7日）"),
+    ("chronic_ewma", "慢性負荷（EWMA 28日）"),
+    ("acwr", "ACWR（7日/28日）"),
+    ("acwr_ewma", "ACWR（EWMA）"),
+    ("monotony", "モノトニー（7日）"),
+    ("strain", "ストレイン（7日）"),
+]
+
+# 指標名（日本語）→ 列名。グラフの指標選択に metric_dict と並べて出す
+LOAD_METRICS = {
+    f"{label} {stat_ja}": f"{base}_{stat}"
+    for base, label in LOAD_BASES.items()
+    for stat, stat_ja in _STATS
+}
+
+KEY_NAMES = ["name_norm", "date"]
+
+
+def _daily_loads(rows, first_days=None):
+    """rows（元データの行）から選手ごとの毎日の負荷を作る（記録のない日は 0）
+
+    first_days（選手 → 日付）を渡すと、その選手はその日から並べる。
+    """
+    loads = pd.DataFrame(index=rows.index)
+    for base in LOAD_BASES:
+        values = rows[base].astype("float64") if base in rows.columns else pd.Series(np.nan, index=rows.index)
+        if base == "srpe" and {"rpe", "training_time_min"} <= set(rows.columns):
+            values = values.fillna(rows["rpe"].astype("float64") * rows["training_time_min"].astype("float64"))
+        loads[base] = values.fillna(0.0)
+    loads.index = pd.MultiIndex.from_arrays(
+        [rows["name_norm"].astype(str), rows["measurement_date"].dt.normalize()], names=KEY_NAMES
+    )
+    loads = loads.groupby(level=KEY_NAMES).sum()
+
+    # 選手ごとに最初〜最後の日を1日刻みで埋める
+    span = loads.reset_index(level="date")["date"].groupby(level="name_norm").agg(["min", "max"])
+    if first_days is not None:
+        span["min"] = pd.Series(first_days).reindex(span.index).fillna(span["min"]).astype(span["max"].dtype)
+    lengths = ((span["max"] - span["min"]).dt.days + 1).to_numpy()
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    days = np.repeat(span["min"].to_numpy(), lengths) + offsets.astype("timedelta64[D]")
+    grid = pd.MultiIndex.from_arrays([np.repeat(span.index.to_numpy(), lengths), days], names=KEY_NAMES)
+    return loads.reindex(grid, fill_value=0.0)
+
+
+def _ewma(daily, span, seeds):
+    """選手ごとの EWMA（seeds があればその選手は前日の値から続けて計算する）"""
+    x = daily
+    if seeds is not None and not seeds.empty:
+        # 前日の EWMA を先頭の観測値として入れておくと、adjust=False の漸化式がその値から続く
+        first_day = daily.reset_index(level="date")["date"].groupby(level="name_norm").min()
+        seeds = seeds[seeds.index.isin(first_day.index)]
+        seeds.index = pd.MultiIndex.from_arrays(
+            [seeds.index, first_day.loc[seeds.index] - pd.Timedelta(days=1)], names=KEY_NAMES
+        )
+        x = pd.concat([seeds, daily]).sort_index()
+    ewma = x.groupby(level="name_norm").ewm(span=span, adjust=False).mean().droplevel(0)
+    return ewma.loc[daily.index]
+
+
+def _compute(daily, seeds=None):
+    """毎日の負荷（KEY_NAMES の MultiIndex・LOAD_BASES の列）から指標を計算する
+
+    seeds は選手ごとの前日の EWMA（列は "<base>_acute_ewma" / "<base>_chronic_ewma"）。
+    """
+    bases = list(LOAD_BASES)
+    grouped = daily.groupby(level="name_norm")
+
+    def rolling(days, how):
+        window = grouped.rolling(days, min_periods=days)
+        return getattr(window, how)().droplevel(0).loc[daily.index]
+
+    acute = rolling(ACUTE_DAYS, "mean")
+    chronic = rolling(CHRONIC_DAYS, "mean")
+    weekly_sum = rolling(ACUTE_DAYS, "sum")
+    weekly_std = rolling(ACUTE_DAYS, "std")
+
+    def seed(suffix):
+        if seeds is None:
+            return None
+        return seeds[[f"{b}_{suffix}" for b in bases]].set_axis(bases, axis=1)
+
+    acute_ewma = _ewma(daily, ACUTE_DAYS, seed("acute_ewma"))
+    chronic_ewma = _ewma(daily, CHRONIC_DAYS, seed("chronic_ewma"))
+    monotony = acute / weekly_std.replace(0.0, np.nan)
+
+    stats = {
+        "acute7": acute,
+        "chronic28": chronic,
+        "acute_ewma": acute_ewma,
+        "chronic_ewma": chronic_ewma,
+        "acwr": acute / chronic.replace(0.0, np.nan),
+        "acwr_ewma": acute_ewma / chronic_ewma.replace(0.0, np.nan),
+        "monotony": monotony,
+        "strain": weekly_sum * monotony,
+    }
+    return pd.concat(
+        {f"{base}_{stat}": values[base] for stat, values in stats.items() for base in bases}, axis=1
+    )
+
+
+class TrainingLoad:
+    """選手 × 日ごとの負荷指標の表
+
+    読み込み時に build() で作り、差分同期では update() で変更のあった選手の
+    変更日以降だけを計算し直す（移動窓の分だけ前の日の負荷と、前日の EWMA から続ける）。
+    どちらも新しいオブジェクトを返す。
+    """
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else pd.DataFrame()
+
+    @classmethod
+    def build(cls, frame):
+        if frame.empty:
+            return cls()
+        return cls(_compute(_daily_loads(frame)))
+
+    def update(self, frame, delta):
+        """delta の行がある選手について、その最初の日以降を frame から計算し直す"""
+        if delta.empty:
+            return self
+        if self.table.empty:
+            return TrainingLoad.build(frame)
+
+        starts = delta["measurement_date"].dt.normalize().groupby(delta["name_norm"].astype(str)).min()
+        known = self.table.reset_index(level="date")["date"].groupby(level="name_norm").agg(["min", "max"])
+        known_first = known["min"]
+        window = pd.Timedelta(days=CHRONIC_DAYS - 1)
+
+        full, tails, parts = [], {}, []
+        for name, start in starts.items():
+            if name in known.index:
+                # 前回の最終日から今回の日までの間（記録のない日）も埋め直す
+                start = min(start, known.at[name, "max"] + pd.Timedelta(days=1))
+            window_start = start - window
+            # 前日の EWMA が手元にない（新しい選手・最初の記録日付近の変更）ときは全期間を計算し直す
+            if name not in known_first.index or window_start - pd.Timedelta(days=1) < known_first[name]:
+                full.append(name)
+                parts.append(select_rows(frame, [name]))
+            else:
+                tails[name] = start
+                parts.append(select_rows(frame, [name], window_start))
+
+        daily = _daily_loads(pd.concat(parts), {name: start - window for name, start in tails.items()})
+        seeds = None
+        if tails:
+            seed_keys = pd.MultiIndex.from_arrays(
+                [list(tails), [s - window - pd.Timedelta(days=1) for s in tails.values()]], names=KEY_NAMES
+            )
+            seeds = self.table.reindex(seed_keys).droplevel("date")
+        fresh = _compute(daily, seeds)
+
+        names = fresh.index.get_level_values("name_norm")
+        dates = fresh.index.get_level_values("date")
+        tail_start = names.map(tails).astype("datetime64[ns]")
+        fresh = fresh[names.isin(full) | (dates >= tail_start)]
+
+        old_names = self.table.index.get_level_values("name_norm")
+        old_dates = self.table.index.get_level_values("date")
+        old_start = old_names.map(tails).astype("datetime64[ns]")
+        stale = old_names.isin(full) | (old_dates >= old_start)
+        return TrainingLoad(pd.concat([self.table[~stale], fresh]).sort_index())
+
+    def lookup(self, rows, cols=None):
+        """rows（name_norm・measurement_date を持つ frame）の各行の指標を rows と同じ index で返す"""
+        cols = list(self.table.columns) if cols is None else cols
+        if self.table.empty or rows.empty:
+            return pd.DataFrame(np.nan, index=rows.index, columns=cols)
+        keys = pd.MultiIndex.from_arrays(
+            [rows["name_norm"].astype(str), rows["measurement_date"].dt.normalize()], names=KEY_NAMES
+        )
+        return self.table[cols].reindex(keys).set_axis(rows.index)